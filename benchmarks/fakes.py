@@ -0,0 +1,314 @@
+"""离线基准测试用的本地替身：Production 表、Drive、yt-dlp 与合成音频
+
+替身只实现本项目实际调用到的接口，可配置每次请求的延迟与失败率，
+install() 之后 GoogleClient 的真实代码路径 (扫描器、写回缓冲、上传、分段下载) 全部作用在替身上。
+"""
+import hashlib
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import threading
+import time
+import types
+import wave
+
+from gspread.utils import a1_to_rowcol
+
+
+class InjectedError(Exception):
+    """按失败率注入的模拟 API 错误"""
+
+
+class _Faults:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def hit(self, name):
+        with self._lock:
+            self.calls += 1
+            fail = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise InjectedError(f"模拟 API 错误: {name}")
+
+
+class FakeWorksheet:
+    """内存中的 Production 表 (A:URL, B:video_id, C:状态, E:字幕, F:行租约)"""
+
+    def __init__(self, rows, latency=0.0, error_rate=0.0):
+        self.spreadsheet_id = 'bench-sheet'
+        self.rows = [list(r) + [""] * (5 - len(r)) for r in rows]
+        self.version = 1
+        self.faults = _Faults(latency, error_rate)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def generate(cls, count, status="等待处理", done_ratio=0.0, **kwargs):
+        """生成 count 行；前 done_ratio 比例的行视为已完结 (状态为空、E 列有内容)"""
+        rows = []
+        done = int(count * done_ratio)
+        for i in range(count):
+            video_id = f"vid{i:07d}"
+            if i < done:
+                rows.append([f"https://youtu.be/{video_id}", video_id, "", "", "已完成"])
+            else:
+                rows.append([f"https://youtu.be/{video_id}", video_id, status, "", ""])
+        return cls(rows, **kwargs)
+
+    def get(self, a1_range):
+        self.faults.hit('get')
+        start = int(a1_range.split(':')[0][1:])
+        with self._lock:
+            values = [r[:3] for r in self.rows[start - 2:]]
+        # 与 Sheets 一致：去掉行尾空单元格
+        return [row[:max((i + 1 for i, v in enumerate(row) if v), default=0)] for row in values]
+
+    def batch_get(self, ranges):
+        self.faults.hit('batch_get')
+        result = []
+        with self._lock:
+            for a1 in ranges:
+                row, col = a1_to_rowcol(a1)
+                cells = self.rows[row - 2] if row - 2 < len(self.rows) else []
+                value = cells[col - 1] if col - 1 < len(cells) else ""
+                result.append([[value]] if value else [])
+        return result
+
+    def batch_update(self, data, value_input_option=None):
+        self.faults.hit('batch_update')
+        with self._lock:
+            for item in data:
+                row, col = a1_to_rowcol(item['range'].split(':')[0])
+                cells = self.rows[row - 2]
+                for offset, value in enumerate(item['values'][0]):
+                    if col + offset > len(cells):
+                        cells.extend([""] * (col + offset - len(cells)))
+                    cells[col - 1 + offset] = value
+            self.version += 1
+
+    def status_counts(self):
+        counts = {}
+        with self._lock:
+            for row in self.rows:
+                counts[row[2]] = counts.get(row[2], 0) + 1
+        return counts
+
+
+class _Request:
+    def __init__(self, faults, name, func):
+        self.faults = faults
+        self.name = name
+        self.func = func
+        self.headers = {}
+
+    def execute(self, num_retries=0):
+        self.faults.hit(self.name)
+        return self.func(self.headers)
+
+
+class FakeDrive:
+    """内存中的 Drive：files().create/update/list/get/get_media/delete 与 changes()"""
+
+    def __init__(self, worksheet=None, latency=0.0, error_rate=0.0):
+        self.worksheet = worksheet
+        self.faults = _Faults(latency, error_rate, seed=1)
+        self.files_by_id = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self.uploaded_bytes = 0
+
+    def add_file(self, name, data, parent=None):
+        with self._lock:
+            self._next_id += 1
+            file_id = f"file{self._next_id}"
+            self.files_by_id[file_id] = {
+                'id': file_id,
+                'name': name,
+                'parents': [parent] if parent else [],
+                'data': data,
+            }
+            self.uploaded_bytes += len(data)
+        return file_id
+
+    @staticmethod
+    def _read_media(media_body):
+        if media_body is None:
+            return b""
+        if hasattr(media_body, '_filename'):
+            with open(media_body._filename, 'rb') as f:
+                return f.read()
+        return media_body.getbytes(0, media_body.size() or 0)
+
+    def _meta(self, f):
+        return {
+            'id': f['id'],
+            'name': f['name'],
+            'parents': f['parents'],
+            'size': str(len(f['data'])),
+            'md5Checksum': hashlib.md5(f['data']).hexdigest(),
+            'modifiedTime': '2024-01-01T00:00:00Z',
+        }
+
+    def files(self):
+        return self
+
+    def changes(self):
+        return _FakeChanges(self)
+
+    def create(self, body=None, media_body=None, fields=None, supportsAllDrives=None):
+        def run(_):
+            parents = body.get('parents') or [None]
+            file_id = self.add_file(body['name'], self._read_media(media_body), parents[0])
+            return {'id': file_id, 'size': str(len(self.files_by_id[file_id]['data']))}
+        return _Request(self.faults, 'files.create', run)
+
+    def update(self, fileId=None, media_body=None, supportsAllDrives=None):
+        def run(_):
+            self.files_by_id[fileId]['data'] = self._read_media(media_body)
+            return {'id': fileId}
+        return _Request(self.faults, 'files.update', run)
+
+    def list(self, q="", fields=None, pageSize=100, pageToken=None, **kwargs):
+        def run(_):
+            with self._lock:
+                files = [self._meta(f) for f in self.files_by_id.values() if self._matches(f, q)]
+            start = int(pageToken or 0)
+            page = files[start:start + pageSize]
+            result = {'files': page}
+            if start + pageSize < len(files):
+                result['nextPageToken'] = str(start + pageSize)
+            return result
+        return _Request(self.faults, 'files.list', run)
+
+    @staticmethod
+    def _matches(f, q):
+        for clause in q.split(' and '):
+            clause = clause.strip()
+            if clause.startswith("name = "):
+                if f['name'] != clause[len("name = '"):-1].replace("\\'", "'"):
+                    return False
+            elif clause.endswith(" in parents"):
+                if clause.split("'")[1] not in f['parents']:
+                    return False
+        return True
+
+    def get(self, fileId=None, fields=None, supportsAllDrives=None):
+        def run(_):
+            if self.worksheet is not None and fileId == self.worksheet.spreadsheet_id:
+                return {'version': str(self.worksheet.version)}
+            return self._meta(self.files_by_id[fileId])
+        return _Request(self.faults, 'files.get', run)
+
+    def get_media(self, fileId=None, supportsAllDrives=None):
+        def run(headers):
+            data = self.files_by_id[fileId]['data']
+            if 'Range' in headers:
+                start, end = map(int, headers['Range'][len('bytes='):].split('-'))
+                return data[start:end + 1]
+            return data
+        return _Request(self.faults, 'files.get_media', run)
+
+    def delete(self, fileId=None, supportsAllDrives=None):
+        def run(_):
+            self.files_by_id.pop(fileId, None)
+            return {}
+        return _Request(self.faults, 'files.delete', run)
+
+
+class _FakeChanges:
+    def __init__(self, drive):
+        self.drive = drive
+
+    def getStartPageToken(self, **kwargs):
+        return _Request(self.drive.faults, 'changes.getStartPageToken', lambda _: {'startPageToken': '1'})
+
+    def list(self, pageToken=None, **kwargs):
+        return _Request(self.drive.faults, 'changes.list', lambda _: {'changes': [], 'newStartPageToken': pageToken})
+
+
+def install(worksheet, drive):
+    """让 GoogleClient 单例直接使用替身，跳过凭据加载"""
+    from src.core.google_api import GoogleClient
+
+    GoogleClient._instance = object.__new__(GoogleClient)
+    GoogleClient._refresh_creds = classmethod(lambda cls: None)
+    GoogleClient._production_sheet = worksheet
+    GoogleClient._scanners = {}
+    GoogleClient.get_drive_service = lambda self: drive
+    return GoogleClient()
+
+
+def write_clip(path, seconds, sample_rate=16000, seed=0):
+    """写入合成的 16kHz 单声道 WAV：带基频与共振峰的音节脉冲 + 低噪声
+
+    仅用于测量吞吐，不含可识别的语音；需要真实语音时通过 --clips 传入录音文件。
+    """
+    rng = random.Random(seed)
+    frames = bytearray()
+    syllable = int(0.25 * sample_rate)
+    for n in range(int(seconds * sample_rate)):
+        t = n / sample_rate
+        pitch = 120 + 30 * math.sin(2 * math.pi * 0.5 * t)
+        envelope = max(0.0, math.sin(math.pi * (n % syllable) / syllable))
+        value = envelope * (
+            0.5 * math.sin(2 * math.pi * pitch * t)
+            + 0.3 * math.sin(2 * math.pi * 700 * t)
+            + 0.2 * math.sin(2 * math.pi * 1200 * t)
+        ) + rng.uniform(-0.02, 0.02)
+        frames += struct.pack('<h', int(max(-1.0, min(1.0, value)) * 12000))
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(bytes(frames))
+    return path
+
+
+def install_fake_yt_dlp(source_clip, bandwidth_mbps=0.0):
+    """用复制本地音频代替 YouTube 下载；bandwidth_mbps > 0 时按该带宽模拟传输耗时"""
+    ext = source_clip.rsplit('.', 1)[-1]
+    size = os.path.getsize(source_clip)
+    duration = None
+    if ext == 'wav':
+        with wave.open(source_clip, 'rb') as f:
+            duration = f.getnframes() / f.getframerate()
+
+    class YoutubeDL:
+        def __init__(self, opts):
+            self.opts = opts
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url, download=True):
+            video_id = url.rsplit('/', 1)[-1]
+            info = {'id': video_id, 'ext': ext, 'format_id': 'bench', 'duration': duration, 'filesize': size}
+            if download:
+                dest = self.prepare_filename(info)
+                if bandwidth_mbps:
+                    time.sleep(size * 8 / (bandwidth_mbps * 1e6))
+                shutil.copyfile(source_clip, dest)
+            return info
+
+        def prepare_filename(self, info):
+            return self.opts['outtmpl'] % info
+
+        @staticmethod
+        def sanitize_info(info):
+            return info
+
+    module = types.ModuleType('yt_dlp')
+    module.YoutubeDL = YoutubeDL
+    sys.modules['yt_dlp'] = module
+    return module
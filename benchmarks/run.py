@@ -0,0 +1,139 @@
+"""离线基准测试：无需网络与 Google 凭据，在普通 Linux 机器上测量三项吞吐
+
+    python3 -m benchmarks.run sheet --rows 20000 --sheets-latency 0.2
+    python3 -m benchmarks.run la --videos 30 --download-mbps 40
+    python3 -m benchmarks.run hk --clips ref1.mp3 ref2.mp3
+    python3 -m benchmarks.run all
+
+sheet: 表格扫描行/秒 (全量与增量)；la: LA 流水线 视频/小时；hk: Whisper 实时率 (RTF)。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.config import Config
+from benchmarks import fakes
+
+
+def _configure(workdir):
+    """所有本地状态写入临时目录，不触碰生产环境的任务库与缓存"""
+    Config.JOB_DB_PATH = os.path.join(workdir, 'jobs.db')
+    Config.LOCAL_TEMP_DIR = os.path.join(workdir, 'temp_audio')
+    Config.VAD_CACHE_DIR = os.path.join(workdir, 'vad')
+    Config.CHECKPOINT_DIR = os.path.join(workdir, 'checkpoints')
+    Config.TRANSCRIPT_CACHE_DIR = os.path.join(workdir, 'transcripts')
+    Config.PREFETCH_DIR = os.path.join(workdir, 'spool')
+    Config.TRANSCRIPT_STORE = ''
+    Config.SYNC_INTERVAL = 3600
+
+
+def bench_sheet(args):
+    from src.core.google_api import SheetScanner
+
+    worksheet = fakes.FakeWorksheet.generate(
+        args.rows, done_ratio=args.done_ratio,
+        latency=args.sheets_latency, error_rate=args.error_rate
+    )
+    fakes.install(worksheet, fakes.FakeDrive(worksheet))
+    scanner = SheetScanner(worksheet, ["等待处理"], full_scan_every=args.scans)
+
+    timings = []
+    for n in range(args.scans):
+        # 每轮都修改版本号，避免命中“版本未变化直接复用”的捷径
+        worksheet.version += 1
+        calls = worksheet.faults.calls
+        start = time.perf_counter()
+        found = len(scanner.scan())
+        elapsed = time.perf_counter() - start
+        timings.append(elapsed)
+        kind = {'full': "全量", 'incremental': "增量", 'cached': "复用"}[scanner.last_scan]
+        print(f"📊 [sheet] 第 {n + 1} 轮 ({kind}): {elapsed * 1000:.1f} ms | 候选 {found} | Sheets 请求 {worksheet.faults.calls - calls}")
+    print(f"✅ [sheet] 全量扫描 {args.rows / timings[0]:.0f} 行/秒 | 增量平均 {sum(timings[1:]) / max(len(timings) - 1, 1) * 1000:.1f} ms")
+
+
+def bench_la(args, workdir):
+    worksheet = fakes.FakeWorksheet.generate(
+        args.videos, latency=args.sheets_latency, error_rate=args.error_rate
+    )
+    drive = fakes.FakeDrive(worksheet, latency=args.drive_latency, error_rate=args.error_rate)
+    fakes.install(worksheet, drive)
+    clip = fakes.write_clip(os.path.join(workdir, 'source.wav'), args.clip_seconds)
+    fakes.install_fake_yt_dlp(clip, args.download_mbps)
+
+    # 令牌桶与字幕探测器在模块导入时创建，须先调整配置
+    Config.MIN_DELAY = Config.MAX_DELAY = 0
+    Config.METADATA_MIN_DELAY = Config.METADATA_MAX_DELAY = 0
+    Config.CAPTION_FAST_PATH = False
+    Config.STREAM_UPLOAD = False
+    Config.AUDIO_FORMAT = args.audio_format
+    Config.DRIVE_FOLDER_ID = 'bench-folder'
+    Config.FETCH_LIMIT = args.videos
+    Config.PIPELINE_REPORT_INTERVAL = 0
+    import fetch_and_upload
+
+    start = time.perf_counter()
+    fetch_and_upload.fetch_and_upload()
+    elapsed = time.perf_counter() - start
+    done = worksheet.status_counts().get("音频已就绪", 0)
+    print(f"✅ [la] {done}/{args.videos} 条完成，耗时 {elapsed:.1f}s → {done / elapsed * 3600:.0f} 视频/小时 | 上传 {drive.uploaded_bytes / 1048576:.1f} MB")
+
+
+def bench_hk(args, workdir):
+    from src.core.transcriber import ResidentModel, transcribe_file
+
+    clips = args.clips
+    if not clips:
+        # 合成音频不含语音，关闭 VAD 以免整段被跳过
+        Config.VAD_PREPASS = False
+        clips = [fakes.write_clip(os.path.join(workdir, f'clip{i}.wav'), args.clip_seconds, seed=i) for i in range(args.clip_count)]
+    Config.WHISPER_BATCHED = args.batched
+
+    model = ResidentModel().get()
+    total_audio = 0.0
+    total_wall = 0.0
+    for path in clips:
+        start = time.perf_counter()
+        result = transcribe_file(model, path, use_cache=False)
+        elapsed = time.perf_counter() - start
+        total_audio += result['duration']
+        total_wall += elapsed
+        print(f"📊 [hk] {os.path.basename(path)}: 音频 {result['duration']:.1f}s | 耗时 {elapsed:.1f}s | RTF {elapsed / max(result['duration'], 1e-6):.3f}")
+    mode = "批量" if args.batched else "顺序"
+    print(f"✅ [hk] {Config.WHISPER_MODEL_SIZE}/{Config.COMPUTE_TYPE} {mode}: RTF {total_wall / max(total_audio, 1e-6):.3f} ({total_audio / max(total_wall, 1e-6):.1f}x 实时)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="离线吞吐基准测试")
+    parser.add_argument('target', choices=['sheet', 'la', 'hk', 'all'])
+    parser.add_argument('--sheets-latency', type=float, default=0.0, help="每次 Sheets 请求的模拟延迟 (秒)")
+    parser.add_argument('--drive-latency', type=float, default=0.0, help="每次 Drive 请求的模拟延迟 (秒)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="API 请求的模拟失败率")
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--done-ratio', type=float, default=0.9, help="已完结行的比例 (增量扫描可跳过)")
+    parser.add_argument('--scans', type=int, default=5)
+    parser.add_argument('--videos', type=int, default=20)
+    parser.add_argument('--download-mbps', type=float, default=0.0, help="模拟下载带宽 (0 为不限)")
+    parser.add_argument('--audio-format', default='native', help="LA 转码模式 (非 native 需要 ffmpeg)")
+    parser.add_argument('--clip-seconds', type=float, default=60.0)
+    parser.add_argument('--clip-count', type=int, default=3)
+    parser.add_argument('--clips', nargs='*', default=[], help="HK 使用的真实语音文件")
+    parser.add_argument('--batched', action='store_true')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix='ytt-bench-') as workdir:
+        _configure(workdir)
+        Config.ensure_dirs()
+        if args.target in ('sheet', 'all'):
+            bench_sheet(args)
+        if args.target in ('la', 'all'):
+            bench_la(args, workdir)
+        if args.target in ('hk', 'all'):
+            bench_hk(args, workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import sys
 from src.core.config import Config
 from src.core.google_api import GoogleClient
 
@@ -53,5 +54,28 @@ def diagnostic():
 
     print("\n🏁 诊断结束。")
 
+def compare_batched(audio_paths):
+    """在参考音频上验证批量推理与顺序推理输出一致"""
+    from src.core.transcriber import ResidentModel, compare_modes
+
+    print("🔍 正在对比顺序 / 批量推理输出...")
+    model = ResidentModel().get()
+    for path, ratio, sequential, batched in compare_modes(model, audio_paths):
+        mark = "✅" if ratio >= 0.95 else "❌"
+        print(f"{mark} {os.path.basename(path)}: 相似度 {ratio:.3f} | 顺序 {sequential:.1f}s | 批量 {batched:.1f}s ({sequential / max(batched, 1e-6):.1f}x)")
+
+def read_transcript(video_id):
+    """从外置字幕存储读取完整字幕"""
+    from src.core.transcript_store import TranscriptStore
+
+    print(TranscriptStore(backend=Config.TRANSCRIPT_STORE or 'local').load(video_id))
+
 if __name__ == "__main__":
-    diagnostic()
+    # 用法: python3 diagnostic.py --compare-batched ref1.mp3 ref2.mp3 ...
+    #       python3 diagnostic.py --read-transcript VIDEO_ID
+    if len(sys.argv) > 2 and sys.argv[1] == "--compare-batched":
+        compare_batched(sys.argv[2:])
+    elif len(sys.argv) == 3 and sys.argv[1] == "--read-transcript":
+        read_transcript(sys.argv[2])
+    else:
+        diagnostic()
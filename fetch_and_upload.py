@@ -1,88 +1,261 @@
 import os
-import time
-import random
+import sys
+import json
+import signal
+import subprocess
 import yt_dlp
 from src.core.config import Config
+from src.core.captions import CaptionProber
+from src.core import metrics
+from src.core.audio import ffmpeg_command, ffmpeg_pipe_command, target_extension
 from src.core.google_api import GoogleClient
+from src.core.job_store import JobStore, SheetSync
+from src.core.lease import LeaseLost
+from src.core.metadata import MetadataProber
+from src.core.pipeline import Pipeline, Stage
+from src.core.planner import order_jobs, take_budget
+from src.core.profiling import JobProfiler
+from src.core.rate_limit import TokenBucket
+from src.core.scheduler import AdaptiveScheduler, sheet_revision_signal
+
+# 进程级共享，跨轮次保持对 YouTube 的请求节奏
+_limiter = TokenBucket(Config.MIN_DELAY, Config.MAX_DELAY, capacity=Config.DOWNLOAD_BURST)
+# 官方字幕探测器，跨轮次记住无字幕的视频
+_prober = CaptionProber() if Config.CAPTION_FAST_PATH else None
+# 视频元数据预取 (时长/大小/字幕可用性)，供按时长调度
+_metadata = MetadataProber() if Config.METADATA_PREFETCH else None
+# 按需开启的逐任务性能剖析 (PROFILE_JOBS)
+_profiler = JobProfiler("la")
 
 def fetch_and_upload():
     """LA 节点逻辑：下载 + 上传云端"""
     Config.ensure_dirs()
     google = GoogleClient()
-    production_sheet = google.get_production_sheet()
+    store = JobStore()
+    sync = SheetSync(store, ["等待处理"])
     
     print("🚀 LA 抓取节点启动 (已模块化)，正在扫描任务...")
     
-    records = production_sheet.get_all_values()
-    processed_count = 0
+    # 从表格拉取新任务到本地库；表格不可用时直接使用本地队列
+    sync.pull()
+    sync.start()
+    try:
+        # 在排序窗口内补齐元数据，再按时长/优先级排序
+        candidates = store.next_jobs("等待处理", Config.SCHEDULE_WINDOW)
+        if _metadata:
+            candidates = _metadata.probe(store, candidates)
+        candidates = order_jobs(candidates)
+        batch = Config.CAPTION_PROBE_BATCH if _prober else Config.FETCH_LIMIT
+        # 多节点共享表格时先认领，候选多取一倍以便在撞车时有空闲行可补
+        jobs = sync.claim(candidates[:batch * 2 if sync.lease else batch], batch)
+        remaining = _fill_from_captions(store, jobs)
+        captioned = len(jobs) - len(remaining)
+        # 按音频分钟预算截取本轮下载，其余归还
+        selected, rest = take_budget(remaining, Config.LA_BUDGET_MINUTES, Config.FETCH_LIMIT)
+        sync.release([job["video_id"] for job in rest])
+        return captioned + _process_jobs(google, store, sync, selected)
+    finally:
+        # 本轮结束统一回推
+        sync.stop()
+        store.close()
+
+def _fill_from_captions(store, jobs):
+    """官方字幕快速通道：有字幕的视频直接回填 E 列，只返回仍需下载音频的任务"""
+    if not _prober or not jobs:
+        return jobs
+    # 元数据已确认无目标语言字幕的视频不再探测
+    found = _prober.probe([job["video_id"] for job in jobs if job.get("has_captions") != 0])
+    for video_id, text in found.items():
+        # 状态保持“等待处理”且 E 列有内容，即视为 ASR 已完成 (与 HK 回填约定一致)
+        store.update(video_id, status="等待处理", transcript=text)
+        print(f"📝 官方字幕已回填 {video_id}，跳过下载")
+        metrics.JOBS.inc(node="la", outcome="captioned")
+    if found:
+        print(f"📝 本批 {len(jobs)} 条中 {len(found)} 条命中官方字幕")
+    return [job for job in jobs if job["video_id"] not in found]
+
+def _process_jobs(google, store, sync, jobs):
+    """下载 → 转码 → 上传 三段流水线：第 N+1 条下载时第 N 条转码、第 N-1 条上传"""
+    jobs = [dict(job) for job in jobs if job["video_id"] and job["status"] == "等待处理"]
+
+    def _profiled(stage, func):
+        """每个阶段开始前确认租约仍在；关闭剖析时 profile() 为空上下文，包装本身几乎无开销"""
+        def run(job):
+            if not sync.held(job["video_id"]):
+                raise LeaseLost(job["video_id"])
+            with _profiler.profile(job["video_id"], stage):
+                return func(job)
+        return run
+
+    def on_error(stage, job, e):
+        if isinstance(e, LeaseLost):
+            # 该行已由其他节点接手，不改动状态
+            print(f"🔒 {job['video_id']} 租约已丢失，放弃 ({stage})")
+            _cleanup(job)
+            return
+        print(f"❌ 失败 {job['video_id']} ({stage}): {str(e)}")
+        metrics.JOBS.inc(node="la", outcome=f"{stage}_failed")
+        store.update(job["video_id"], status="抓取失败")
+        _cleanup(job)
+
+    if Config.STREAM_UPLOAD and Config.DRIVE_FOLDER_ID:
+        # 流式模式：下载、转码、上传在同一条管道内完成，不经过本地磁盘
+        stages = [
+            Stage("stream", _profiled("stream", lambda job: _stream_upload(google, store, job)), Config.DOWNLOAD_CONCURRENCY, Config.PIPELINE_QUEUE_SIZE),
+        ]
+    else:
+        stages = [
+            Stage("download", _profiled("download", _download), Config.DOWNLOAD_CONCURRENCY, Config.PIPELINE_QUEUE_SIZE),
+            Stage("transcode", _profiled("transcode", _transcode), Config.TRANSCODE_WORKERS, Config.PIPELINE_QUEUE_SIZE),
+            Stage("upload", _profiled("upload", lambda job: _upload(google, store, job)), Config.UPLOAD_WORKERS, Config.PIPELINE_QUEUE_SIZE),
+        ]
+    pipeline = Pipeline(stages, on_error=on_error)
+    for job in jobs:
+        store.start_attempt(job["video_id"])
+    completed = pipeline.run(jobs, report_interval=Config.PIPELINE_REPORT_INTERVAL)
+    pipeline.report()
+    print(f"\n本轮完成 {len(completed)}/{len(jobs)} 条。")
+    return len(completed)
+
+def _download(job):
+    video_id = job["video_id"]
+    
+    # yt-dlp 配置 (限速控制)，仅下载原始音频流，转码交给下一阶段
+    ydl_opts = {
+        'format': 'm4a/bestaudio/best',
+        'outtmpl': os.path.join(Config.LOCAL_TEMP_DIR, f'{video_id}.%(ext)s'),
+        'ratelimit': 5242880, # 5M
+        'quiet': True,
+    }
+
+    # 令牌桶防风控：所有下载线程共享同一节奏
+    waited = _limiter.acquire()
+    metrics.RATE_LIMIT_WAIT.observe(waited)
+    print(f"⏳ {video_id} 安全等待 {waited:.1f} 秒")
+    
+    print(f"📥 正在下载 {video_id} (限速 {Config.RATE_LIMIT})...")
+    with metrics.STAGE_SECONDS.time(stage="yt_dlp"), yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(job["url"], download=True)
+        job["source_path"] = ydl.prepare_filename(info)
+    metrics.BYTES_DOWNLOADED.inc(os.path.getsize(job["source_path"]))
+    return job
+
+def _transcode(job):
+    """按 AUDIO_FORMAT 转码；native 模式直接透传原始音频流"""
+    source_path = job["source_path"]
+    ext = target_extension(source_path)
+    local_path = os.path.join(Config.LOCAL_TEMP_DIR, f"{job['video_id']}.{ext}")
+    cmd = ffmpeg_command(source_path, local_path)
+    if cmd:
+        subprocess.run(cmd, check=True)
+        os.remove(source_path)
+    elif source_path != local_path:
+        os.rename(source_path, local_path)
+    job["local_path"] = local_path
+    return job
+
+def _upload(google, store, job):
+    video_id = job["video_id"]
+    local_path = job["local_path"]
+    filename = os.path.basename(local_path)
+    size = os.path.getsize(local_path)
     
-    for i, row in enumerate(records[1:], start=2):
-        if processed_count >= Config.FETCH_LIMIT:
-            break
-            
-        video_url = row[0]
-        video_id = row[1]
-        status = row[2] if len(row) > 2 else ""
-        
-        # 仅处理被人工打上"等待处理"标签的行 (防盲目抓取代价)
-        if video_id and status == "等待处理":
-            if "音频已就绪" in status:
-                continue
-
-            print(f"\n--- 正在处理: {video_id} ---")
-            local_path = os.path.join(Config.LOCAL_TEMP_DIR, f"{video_id}.mp3")
-            
-            # yt-dlp 配置 (限速控制)
-            ydl_opts = {
-                'format': 'm4a/bestaudio/best',
-                'outtmpl': os.path.join(Config.LOCAL_TEMP_DIR, f'{video_id}.%(ext)s'),
-                'ratelimit': 5242880, # 5M
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '128',
-                }],
-                'quiet': True,
-            }
-
-            try:
-                # 随机延迟防风控
-                delay = random.uniform(Config.MIN_DELAY, Config.MAX_DELAY)
-                print(f"⏳ 安全等待 {delay:.1f} 秒...")
-                time.sleep(delay)
-                
-                print(f"📥 正在下载 (限速 {Config.RATE_LIMIT})...")
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([video_url])
-                
-                # 上传逻辑
-                if Config.DRIVE_FOLDER_ID:
-                    google.upload_to_drive(local_path, f"{video_id}.mp3")
-                    if os.path.exists(local_path):
-                        os.remove(local_path)
-                    print(f"🧹 本地缓存已清理")
-                elif Config.RCLONE_MOUNT_PATH:
-                    dest_path = os.path.join(Config.RCLONE_MOUNT_PATH, f"{video_id}.mp3")
-                    os.rename(local_path, dest_path)
-                    print(f"📦 已移动至 Rclone 挂载点")
-
-                # 更新 Sheets
-                production_sheet.update_cell(i, 3, "音频已就绪")
-                print(f"✅ 处理完成 (行 {i})")
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"❌ 失败 {video_id}: {str(e)}")
-                production_sheet.update_cell(i, 3, "抓取失败")
+    if Config.DRIVE_FOLDER_ID:
+        google.upload_to_drive(local_path, filename)
+        if os.path.exists(local_path):
+            os.remove(local_path)
+        print(f"🧹 本地缓存已清理")
+    elif Config.RCLONE_MOUNT_PATH:
+        dest_path = os.path.join(Config.RCLONE_MOUNT_PATH, filename)
+        os.rename(local_path, dest_path)
+        print(f"📦 已移动至 Rclone 挂载点")
+
+    metrics.BYTES_UPLOADED.inc(size)
+    metrics.JOBS.inc(node="la", outcome="uploaded")
+    # 更新本地状态，由同步线程批量回推 Sheets
+    store.update(video_id, status="音频已就绪")
+    print(f"✅ 处理完成 {video_id} (行 {job['sheet_row']})")
+    return job
+
+def _stream_upload(google, store, job):
+    """yt-dlp (→ FFmpeg) 的标准输出直接分块续传至 Drive"""
+    video_id = job["video_id"]
+
+    # 令牌桶防风控：所有下载线程共享同一节奏
+    waited = _limiter.acquire()
+    metrics.RATE_LIMIT_WAIT.observe(waited)
+    print(f"⏳ {video_id} 安全等待 {waited:.1f} 秒")
+
+    # 先解析一次格式以确定扩展名，子进程通过 --load-info-json 复用，不再重复请求 YouTube
+    with yt_dlp.YoutubeDL({'format': 'm4a/bestaudio/best', 'quiet': True}) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(job["url"], download=False))
+    ext = target_extension(f"{video_id}.{info['ext']}")
+    filename = f"{video_id}.{ext}"
+    info_path = os.path.join(Config.LOCAL_TEMP_DIR, f"{video_id}.info.json")
+    job["source_path"] = info_path
+    with open(info_path, 'w') as f:
+        json.dump(info, f)
+
+    print(f"📡 正在流式上传 {filename} (限速 {Config.RATE_LIMIT})...")
+    procs = [subprocess.Popen(
+        [sys.executable, '-m', 'yt_dlp', '--load-info-json', info_path, '-f', info['format_id'],
+         '--limit-rate', Config.RATE_LIMIT, '--quiet', '-o', '-'],
+        stdout=subprocess.PIPE
+    )]
+    cmd = ffmpeg_pipe_command()
+    if cmd:
+        procs.append(subprocess.Popen(cmd, stdin=procs[0].stdout, stdout=subprocess.PIPE))
+        # 关闭父进程持有的管道端，下游退出时上游能收到 SIGPIPE
+        procs[0].stdout.close()
+
+    response = None
+    try:
+        response = google.upload_stream_to_drive(procs[-1].stdout, filename)
+    finally:
+        if response is None:
+            for proc in procs:
+                proc.kill()
+        procs[-1].stdout.close()
+        codes = [proc.wait() for proc in procs]
+        os.remove(info_path)
+
+    if any(codes):
+        # 源进程异常退出时上传内容不完整，删除残缺文件
+        google.delete_from_drive(response['id'])
+        raise RuntimeError(f"下载/转码进程异常退出: {codes}")
+
+    size = int(response.get('size', 0))
+    metrics.BYTES_DOWNLOADED.inc(size)
+    metrics.BYTES_UPLOADED.inc(size)
+    metrics.JOBS.inc(node="la", outcome="uploaded")
+    # 更新本地状态，由同步线程批量回推 Sheets
+    store.update(video_id, status="音频已就绪")
+    print(f"✅ 处理完成 {video_id} ({size / 1048576:.1f} MB, 行 {job['sheet_row']})")
+    return job
+
+def _cleanup(job):
+    """失败时清理该条目残留的中间文件"""
+    for key in ("source_path", "local_path"):
+        path = job.get(key)
+        if path and os.path.exists(path):
+            os.remove(path)
 
 if __name__ == "__main__":
-    while True:
+    # pkill 发送 SIGTERM 时走正常退出流程，保证本地状态被回推
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    def cycle():
         try:
-            fetch_and_upload()
-            print(f"\n进入休眠，等待下一轮 ({10} 分钟)...")
-            time.sleep(600)
-        except KeyboardInterrupt:
-            break
+            return fetch_and_upload()
         except Exception as e:
             print(f"运行时错误: {e}")
-            time.sleep(300)
+            # 丢弃缓存的表格句柄，下一轮重新打开
+            GoogleClient.reset_cache()
+            return 0
+
+    metrics.start_server(Config.LA_METRICS_PORT)
+    try:
+        # 新视频入表后数秒内开始下载，空闲时逐步退避至 LA_IDLE_MAX
+        AdaptiveScheduler(cycle, [sheet_revision_signal], Config.LA_IDLE_MAX).run_forever()
+    except KeyboardInterrupt:
+        pass
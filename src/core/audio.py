@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+from collections import namedtuple
+from src.core.config import Config
+
+# 音频格式模式 -> (扩展名, FFmpeg 编码参数)；native 表示直接保留 YouTube 原始容器
+AUDIO_FORMATS = {
+    'mp3': ('mp3', ['-codec:a', 'libmp3lame', '-b:a', '128k']),
+    'opus': ('opus', ['-ac', '1', '-ar', '16000', '-codec:a', 'libopus', '-b:a', '24k']),
+    'flac': ('flac', ['-ac', '1', '-ar', '16000', '-codec:a', 'flac']),
+    'native': (None, None),
+}
+
+# 通过管道输出时 FFmpeg 无法从扩展名推断容器，需显式指定
+FFMPEG_MUXERS = {'mp3': 'mp3', 'opus': 'ogg', 'flac': 'flac'}
+
+MIME_TYPES = {
+    'mp3': 'audio/mpeg',
+    'm4a': 'audio/mp4',
+    'mp4': 'audio/mp4',
+    'webm': 'audio/webm',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'flac': 'audio/flac',
+    'wav': 'audio/wav',
+}
+
+AUDIO_EXTENSIONS = tuple(MIME_TYPES)
+
+# 各容器的名义码率 (kbit/s)：没有视频元数据时按文件大小粗略估算时长
+NOMINAL_KBPS = {
+    'mp3': 128,
+    'm4a': 128,
+    'mp4': 128,
+    'webm': 130,
+    'opus': 24,
+    'ogg': 24,
+    'flac': 140,
+    'wav': 256,
+}
+
+
+def target_extension(source_path, mode=None):
+    """给定下载得到的源文件，返回当前模式下的目标扩展名"""
+    ext, _ = AUDIO_FORMATS[mode or Config.AUDIO_FORMAT]
+    return ext or source_path.rsplit('.', 1)[-1]
+
+
+def ffmpeg_command(source_path, dest_path, mode=None):
+    """返回转码命令；native 模式或源文件已是目标格式时返回 None"""
+    _, codec_args = AUDIO_FORMATS[mode or Config.AUDIO_FORMAT]
+    if codec_args is None or source_path == dest_path:
+        return None
+    return ['ffmpeg', '-y', '-loglevel', 'error', '-i', source_path, '-vn'] + codec_args + [dest_path]
+
+
+def ffmpeg_pipe_command(mode=None):
+    """stdin -> stdout 的流式转码命令；native 模式返回 None"""
+    mode = mode or Config.AUDIO_FORMAT
+    _, codec_args = AUDIO_FORMATS[mode]
+    if codec_args is None:
+        return None
+    return (['ffmpeg', '-loglevel', 'error', '-i', 'pipe:0', '-vn'] + codec_args
+            + ['-f', FFMPEG_MUXERS[mode], 'pipe:1'])
+
+
+def mimetype_for(path):
+    return MIME_TYPES.get(path.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+
+
+def split_audio_name(name):
+    """'<video_id>.<ext>' -> (video_id, ext)；非音频文件返回 None"""
+    stem, dot, ext = name.rpartition('.')
+    if not dot or not stem or ext.lower() not in AUDIO_EXTENSIONS:
+        return None
+    return stem, ext.lower()
+
+
+def estimate_duration(name, size):
+    """按扩展名的名义码率由文件大小估算音频秒数；无法估算时返回 None"""
+    kbps = NOMINAL_KBPS.get(name.rsplit('.', 1)[-1].lower())
+    if not kbps or not size:
+        return None
+    return int(size) * 8 / (kbps * 1000)
+
+
+AudioEntry = namedtuple('AudioEntry', 'path size mtime')
+
+
+class AudioInventory:
+    """音频目录清单：每轮只列一次目录 (可选再列一次 Drive 文件夹)，之后的存在性检查全部查表
+
+    rclone 挂载上每次 stat 都可能触发远端查询，逐条 os.path.exists 的开销随任务数线性增长。
+    以下文件视为仍在同步中，本轮跳过：
+    - 大小与上一轮清单不一致，或修改时间距今不足 AUDIO_SETTLE_SECONDS
+    - 提供 Drive 清单时，本地大小小于 Drive 上记录的大小
+    """
+
+    def __init__(self, directory, settle_seconds=None):
+        self.directory = directory
+        self.settle_seconds = Config.AUDIO_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self._entries = {}
+        self._previous = {}
+        self._remote_sizes = {}
+
+    def refresh(self, drive_folder_id=None):
+        """重新列目录；返回清单中的音频数"""
+        preferred = AUDIO_FORMATS[Config.AUDIO_FORMAT][0] or 'm4a'
+        self._previous = self._entries
+        entries = {}
+        try:
+            with os.scandir(self.directory) as it:
+                for item in it:
+                    parsed = split_audio_name(item.name)
+                    if parsed is None or not item.is_file():
+                        continue
+                    video_id, ext = parsed
+                    # 同一视频存在多种格式时优先当前模式的扩展名
+                    if video_id in entries and ext != preferred:
+                        continue
+                    stat = item.stat()
+                    entries[video_id] = AudioEntry(item.path, stat.st_size, stat.st_mtime)
+        except FileNotFoundError:
+            pass
+        self._entries = entries
+
+        self._remote_sizes = {}
+        if drive_folder_id:
+            from src.core.google_api import GoogleClient
+            for f in GoogleClient().list_drive_folder(drive_folder_id):
+                parsed = split_audio_name(f['name'])
+                if parsed and 'size' in f:
+                    self._remote_sizes[parsed[0]] = int(f['size'])
+        return len(entries)
+
+    def lookup(self, video_id):
+        return self._entries.get(video_id)
+
+    def find(self, video_id):
+        """返回 (路径, None) 或 (None, 原因)"""
+        entry = self._entries.get(video_id)
+        if entry is None:
+            return None, "音频文件未找到"
+        remote_size = self._remote_sizes.get(video_id)
+        if remote_size is not None and entry.size < remote_size:
+            return None, f"同步未完成 ({entry.size}/{remote_size} 字节)"
+        previous = self._previous.get(video_id)
+        if previous is not None and previous.size != entry.size:
+            return None, "文件大小仍在变化"
+        if time.time() - entry.mtime < self.settle_seconds:
+            return None, "文件刚写入，等待同步稳定"
+        return entry.path, None
+
+
+class DriveAudioInventory:
+    """直接以 Drive 文件夹作为音频来源 (不依赖 rclone 挂载)：每轮列一次文件夹
+
+    find() 返回 Drive 文件元数据，由 AudioPrefetcher 分段并行下载到本地后再转录。
+    Drive 上的文件只有在上传完成后才可见，无需等待同步稳定。
+    """
+
+    def __init__(self, folder_id):
+        self.folder_id = folder_id
+        self.directory = f"drive:{folder_id}"
+        self._entries = {}
+
+    def refresh(self, drive_folder_id=None):
+        from src.core.google_api import GoogleClient
+        preferred = AUDIO_FORMATS[Config.AUDIO_FORMAT][0] or 'm4a'
+        entries = {}
+        for f in GoogleClient().list_drive_folder(self.folder_id):
+            parsed = split_audio_name(f['name'])
+            if parsed is None or 'size' not in f:
+                continue
+            video_id, ext = parsed
+            if video_id in entries and ext != preferred:
+                continue
+            entries[video_id] = f
+        self._entries = entries
+        return len(entries)
+
+    def lookup(self, video_id):
+        return self._entries.get(video_id)
+
+    def find(self, video_id):
+        entry = self._entries.get(video_id)
+        if entry is None:
+            return None, "音频文件未找到"
+        return entry, None
+
+
+def create_inventory():
+    """按配置选择音频来源：Drive 直连 / rclone 挂载 / 本地目录；Drive 直连缺少 DRIVE_FOLDER_ID 时直接退出"""
+    if Config.DRIVE_AUDIO_SOURCE:
+        if not Config.DRIVE_FOLDER_ID:
+            sys.exit("❌ DRIVE_AUDIO_SOURCE=true 需要设置 DRIVE_FOLDER_ID (音频所在的 Drive 文件夹)")
+        return DriveAudioInventory(Config.DRIVE_FOLDER_ID)
+    return AudioInventory(Config.RCLONE_MOUNT_PATH if Config.RCLONE_MOUNT_PATH else Config.LOCAL_TEMP_DIR)
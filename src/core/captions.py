@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+from youtube_transcript_api import (
+    NoTranscriptFound,
+    TranscriptsDisabled,
+    VideoUnavailable,
+    YouTubeTranscriptApi,
+)
+from src.core.config import Config
+
+
+class CaptionProber:
+    """官方字幕快速通道：批量并发探测，有字幕的视频直接回填，无需下载与 Whisper 转录
+
+    已确认无字幕 (无目标语言字幕 / 字幕被关闭 / 视频不可用) 的 video_id 在进程内记住，后续轮次不再重复探测；
+    网络错误、请求被拦截等暂时性失败只回退到本轮下载，下一轮仍会探测。
+    """
+
+    def __init__(self, languages=None, workers=None):
+        self.languages = languages or Config.CAPTION_LANGUAGES
+        self.workers = workers or Config.CAPTION_PROBE_WORKERS
+        self._api = YouTubeTranscriptApi()
+        self._unavailable = set()
+
+    def _fetch(self, video_id):
+        """返回字幕全文；确认无字幕时返回空串，暂时性失败返回 None"""
+        try:
+            transcript = self._api.fetch(video_id, languages=self.languages)
+        except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable):
+            return ""
+        except Exception:
+            # 网络错误 / RequestBlocked / IP 封禁等，本轮回退到音频下载
+            return None
+        return " ".join(t['text'] for t in transcript.to_raw_data())
+
+    def probe(self, video_ids):
+        """返回 {video_id: 字幕全文}，仅包含有字幕的视频"""
+        pending = [v for v in video_ids if v not in self._unavailable]
+        if not pending:
+            return {}
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            texts = list(pool.map(self._fetch, pending))
+        found = {}
+        for video_id, text in zip(pending, texts):
+            if text and text.strip():
+                found[video_id] = text
+            elif text is not None:
+                self._unavailable.add(video_id)
+        return found
@@ -0,0 +1,82 @@
+import json
+import os
+from src.core.config import Config
+
+
+class SegmentCheckpoint:
+    """逐段落盘的转录检查点 (JSONL)：进程崩溃后从最后一个已写入片段的结束时间续转
+
+    首行记录模型参数，参数变化后旧检查点作废；转录成功后删除。
+    片段文本只保存在检查点文件中，全文在转录结束时由 text() 从文件拼接，内存中不累积片段列表。
+    """
+
+    def __init__(self, audio_path, prompt):
+        key = f"{os.path.basename(audio_path)}-{os.path.getsize(audio_path)}"
+        self.path = os.path.join(Config.CHECKPOINT_DIR, f"{key}.jsonl")
+        self.header = {
+            'model': Config.WHISPER_MODEL_SIZE,
+            'compute': Config.COMPUTE_TYPE,
+            'prompt': prompt,
+        }
+        self._file = None
+
+    def _records(self):
+        """逐条读取有效片段记录；头部与当前参数不符时不产出"""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as f:
+            try:
+                if json.loads(f.readline()) != self.header:
+                    return
+                for line in f:
+                    record = json.loads(line)
+                    yield record['end'], record['text']
+            except (ValueError, KeyError):
+                # 最后一行可能在崩溃时只写了一半，之前的记录仍然有效
+                return
+
+    def load(self):
+        """返回 (已完成片段数, 续转起点秒数)；无有效检查点时返回 (0, 0.0)"""
+        count = 0
+        offset = 0.0
+        for offset, _ in self._records():
+            count += 1
+        return count, offset
+
+    def text(self):
+        """按顺序拼接检查点中的全部片段文本"""
+        return " ".join(text for _, text in self._records())
+
+    def open(self, resume):
+        os.makedirs(Config.CHECKPOINT_DIR, exist_ok=True)
+        if resume:
+            self._truncate_partial_line()
+            self._file = open(self.path, 'a', encoding='utf-8')
+        else:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._write(self.header)
+
+    def _truncate_partial_line(self):
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end < len(data):
+                f.truncate(end)
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def append(self, segment):
+        self._write({'end': segment.end, 'text': segment.text})
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
@@ -18,16 +18,124 @@ class Config:
     
     # LA 节点参数
     RATE_LIMIT = os.getenv('DOWNLOAD_RATE_LIMIT', '5M')
+    # 空闲时最长休眠秒数 (兜底轮询)；期间检测到表格变更会立即开始下一轮
+    LA_IDLE_MAX = int(os.getenv('LA_IDLE_MAX', 600))
     FETCH_LIMIT = int(os.getenv('FETCH_LIMIT', 10))
     MIN_DELAY = int(os.getenv('MIN_DELAY', 30))
     MAX_DELAY = int(os.getenv('MAX_DELAY', 120))
+    # 并发下载线程数；令牌桶按 MIN_DELAY~MAX_DELAY 的随机间隔发放下载许可
+    DOWNLOAD_CONCURRENCY = int(os.getenv('DOWNLOAD_CONCURRENCY', 3))
+    DOWNLOAD_BURST = int(os.getenv('DOWNLOAD_BURST', 1))
+    # 官方字幕快速通道：下载前批量探测字幕，有字幕则直接回填
+    CAPTION_FAST_PATH = os.getenv('CAPTION_FAST_PATH', 'true').lower() == 'true'
+    CAPTION_LANGUAGES = os.getenv('CAPTION_LANGUAGES', 'zh-Hans,zh-Hant,en').split(',')
+    CAPTION_PROBE_BATCH = int(os.getenv('CAPTION_PROBE_BATCH', 30))
+    CAPTION_PROBE_WORKERS = int(os.getenv('CAPTION_PROBE_WORKERS', 4))
+    # 音频格式：mp3 (兼容旧流程) / native (保留原始 m4a/opus 不转码) / opus、flac (16kHz 单声道，适配 Whisper)
+    AUDIO_FORMAT = os.getenv('AUDIO_FORMAT', 'mp3')
+    # 流式上传：yt-dlp/FFmpeg 输出直接分块续传至 Drive，不写本地临时文件 (需配置 DRIVE_FOLDER_ID)
+    STREAM_UPLOAD = os.getenv('STREAM_UPLOAD', 'false').lower() == 'true'
+    UPLOAD_CHUNK_SIZE = int(os.getenv('UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024))
+    UPLOAD_RETRIES = int(os.getenv('UPLOAD_RETRIES', 5))
+    # 下载 → 转码 → 上传 流水线各阶段线程数与队列深度
+    TRANSCODE_WORKERS = int(os.getenv('TRANSCODE_WORKERS', 1))
+    UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 2))
+    PIPELINE_REPORT_INTERVAL = int(os.getenv('PIPELINE_REPORT_INTERVAL', 300))
     
     # HK 节点参数
     WHISPER_MODEL_SIZE = os.getenv('WHISPER_MODEL_SIZE', 'medium')
     DEVICE = os.getenv('DEVICE', 'cpu')
     COMPUTE_TYPE = os.getenv('COMPUTE_TYPE', 'int8')
     TRANSCRIPTION_LIMIT = int(os.getenv('TRANSCRIPTION_LIMIT', 5))
+    HK_IDLE_MAX = int(os.getenv('HK_IDLE_MAX', 300))
+    # 音频清单：修改时间距今不足该秒数的文件视为仍在同步；可选对照 Drive 文件夹清单校验大小
+    AUDIO_SETTLE_SECONDS = int(os.getenv('AUDIO_SETTLE_SECONDS', 60))
+    AUDIO_INVENTORY_DRIVE = os.getenv('AUDIO_INVENTORY_DRIVE', 'false').lower() == 'true'
+    # 预取：转录当前文件时把后续最多 PREFETCH_DEPTH 个音频从挂载复制到本地 (0 为关闭)
+    PREFETCH_DEPTH = int(os.getenv('PREFETCH_DEPTH', 2))
+    PREFETCH_DIR = os.getenv('PREFETCH_DIR', 'cache/spool')
+    PREFETCH_MAX_MB = int(os.getenv('PREFETCH_MAX_MB', 2048))
+    # Drive 直连：不依赖 rclone 挂载，按 Range 分段并行下载 DRIVE_FOLDER_ID 中的音频并校验 md5
+    DRIVE_AUDIO_SOURCE = os.getenv('DRIVE_AUDIO_SOURCE', 'false').lower() == 'true'
+    DRIVE_DOWNLOAD_WORKERS = int(os.getenv('DRIVE_DOWNLOAD_WORKERS', 4))
+    DRIVE_DOWNLOAD_CHUNK_MB = int(os.getenv('DRIVE_DOWNLOAD_CHUNK_MB', 16))
+    DRIVE_DOWNLOAD_RETRIES = int(os.getenv('DRIVE_DOWNLOAD_RETRIES', 5))
+    # 模型空闲超过该秒数后释放内存，下次有任务时重新加载
+    WHISPER_IDLE_TIMEOUT = int(os.getenv('WHISPER_IDLE_TIMEOUT', 1800))
+    # 转录进程池：进程数 (0 为按核数与模型内存自动推算)、每进程线程数 (0 为默认)、每模型并行解码数
+    TRANSCRIBE_PROCESSES = int(os.getenv('TRANSCRIBE_PROCESSES', 0))
+    WHISPER_CPU_THREADS = int(os.getenv('WHISPER_CPU_THREADS', 0))
+    WHISPER_NUM_WORKERS = int(os.getenv('WHISPER_NUM_WORKERS', 1))
+    # 批量推理：按 VAD 切块后每次前向并行解码 WHISPER_BATCH_SIZE 个块
+    WHISPER_BATCHED = os.getenv('WHISPER_BATCHED', 'false').lower() == 'true'
+    WHISPER_BATCH_SIZE = int(os.getenv('WHISPER_BATCH_SIZE', 8))
+    WHISPER_BEAM_SIZE = int(os.getenv('WHISPER_BEAM_SIZE', 5))
+    # VAD 预处理：只解码语音区间，区间结果缓存以便重新转录时复用
+    VAD_PREPASS = os.getenv('VAD_PREPASS', 'true').lower() == 'true'
+    VAD_MIN_SILENCE_MS = int(os.getenv('VAD_MIN_SILENCE_MS', 2000))
+    VAD_CACHE_DIR = os.getenv('VAD_CACHE_DIR', 'cache/vad')
+    # 转录检查点：逐段落盘，崩溃重启后续转
+    CHECKPOINT_DIR = os.getenv('CHECKPOINT_DIR', 'cache/checkpoints')
+    # 字幕缓存：按解码后音频内容寻址，超过上限按最近使用时间淘汰
+    TRANSCRIPT_CACHE = os.getenv('TRANSCRIPT_CACHE', 'true').lower() == 'true'
+    TRANSCRIPT_CACHE_DIR = os.getenv('TRANSCRIPT_CACHE_DIR', 'cache/transcripts')
+    TRANSCRIPT_CACHE_MAX_MB = int(os.getenv('TRANSCRIPT_CACHE_MAX_MB', 512))
+    # 表格外字幕存储：local / drive (留空则整篇写入 E 列)，E 列只保留预览 + 指针
+    TRANSCRIPT_STORE = os.getenv('TRANSCRIPT_STORE', '')
+    TRANSCRIPT_STORE_DIR = os.getenv('TRANSCRIPT_STORE_DIR', 'transcripts')
+    TRANSCRIPT_STORE_FOLDER_ID = os.getenv('TRANSCRIPT_STORE_FOLDER_ID', '')
+    TRANSCRIPT_STORE_CODEC = os.getenv('TRANSCRIPT_STORE_CODEC', 'gzip')
+    TRANSCRIPT_PREVIEW_CHARS = int(os.getenv('TRANSCRIPT_PREVIEW_CHARS', 200))
     
+    # Sheets 写回缓冲 (合并写入以节省配额)
+    SHEET_FLUSH_SIZE = int(os.getenv('SHEET_FLUSH_SIZE', 20))
+    SHEET_FLUSH_INTERVAL = int(os.getenv('SHEET_FLUSH_INTERVAL', 30))
+    # 增量扫描：每 N 轮从头全量重扫一次
+    SCAN_FULL_EVERY = int(os.getenv('SCAN_FULL_EVERY', 12))
+    
+    # 本地任务库 (SQLite) 与表格同步间隔 (秒)
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'jobs.db')
+    SYNC_INTERVAL = int(os.getenv('SYNC_INTERVAL', 60))
+
+    # 行租约：多个节点共享同一张表时认领任务，租约写入 LEASE_COLUMN 列并定期续期
+    ROW_LEASING = os.getenv('ROW_LEASING', 'false').lower() == 'true'
+    NODE_ID = os.getenv('NODE_ID', '')
+    LEASE_COLUMN = os.getenv('LEASE_COLUMN', 'F')
+    LEASE_TTL = int(os.getenv('LEASE_TTL', 900))
+    LEASE_SETTLE_SECONDS = float(os.getenv('LEASE_SETTLE_SECONDS', 3))
+
+    # 按时长调度：LA 预取视频元数据 (时长/大小/字幕)，两个节点按 SCHEDULE_ORDER 排序并按音频分钟预算截取每轮任务
+    # SCHEDULE_ORDER: shortest (短视频优先) / priority (按 PRIORITY_COLUMN 降序) / sheet (表格行序)
+    SCHEDULE_ORDER = os.getenv('SCHEDULE_ORDER', 'shortest')
+    PRIORITY_COLUMN = os.getenv('PRIORITY_COLUMN', '')
+    SCHEDULE_WINDOW = int(os.getenv('SCHEDULE_WINDOW', 100))
+    SCHEDULE_MAX_WAIT_HOURS = float(os.getenv('SCHEDULE_MAX_WAIT_HOURS', 24))
+    SCHEDULE_DEFAULT_MINUTES = float(os.getenv('SCHEDULE_DEFAULT_MINUTES', 15))
+    LA_BUDGET_MINUTES = float(os.getenv('LA_BUDGET_MINUTES', 240))
+    HK_BUDGET_MINUTES = float(os.getenv('HK_BUDGET_MINUTES', 120))
+    METADATA_PREFETCH = os.getenv('METADATA_PREFETCH', 'true').lower() == 'true'
+    METADATA_BATCH = int(os.getenv('METADATA_BATCH', 10))
+    METADATA_MIN_DELAY = float(os.getenv('METADATA_MIN_DELAY', 5))
+    METADATA_MAX_DELAY = float(os.getenv('METADATA_MAX_DELAY', 15))
+    METADATA_WORKERS = int(os.getenv('METADATA_WORKERS', 2))
+
+    # 自适应调度：每 CHANGE_POLL_INTERVAL 秒探测一次表格版本 / Drive 变更，
+    # 有产出后休眠 IDLE_MIN_SECONDS，连续空转时指数退避到 LA_IDLE_MAX / HK_IDLE_MAX
+    CHANGE_POLL_INTERVAL = int(os.getenv('CHANGE_POLL_INTERVAL', 15))
+    IDLE_MIN_SECONDS = int(os.getenv('IDLE_MIN_SECONDS', 30))
+    
+    # 逐任务性能剖析：cProfile + tracemalloc + RSS 采样，只保留耗时最长的 PROFILE_KEEP 个任务
+    PROFILE_JOBS = os.getenv('PROFILE_JOBS', 'false').lower() == 'true'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', 10))
+    PROFILE_TOP = int(os.getenv('PROFILE_TOP', 20))
+
+    # 指标端点 (Prometheus 文本格式 /metrics)，端口为 0 时关闭
+    METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+    LA_METRICS_PORT = int(os.getenv('LA_METRICS_PORT', 9101))
+    HK_METRICS_PORT = int(os.getenv('HK_METRICS_PORT', 9102))
+
     # 路径配置
     LOCAL_TEMP_DIR = os.getenv('LOCAL_TEMP_DIR', 'temp_audio')
 
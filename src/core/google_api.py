@@ -1,20 +1,52 @@
+import hashlib
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import gspread
+import httplib2
+import google_auth_httplib2
+from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from oauth2client.service_account import ServiceAccountCredentials
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, MediaInMemoryUpload, MediaUpload
+from src.core import metrics
 from src.core.config import Config
+from src.core.audio import mimetype_for
+
+# 处于流水线中的状态；其余状态 (空/失败/发布成功) 视为已完结，扫描游标可越过
+ACTIVE_STATUSES = ("等待处理", "音频已就绪")
+
+def _count_requests(http, api):
+    """包装 http.request，统计经由该连接发出的 API 请求数"""
+    request = http.request
+
+    def counted(*args, **kwargs):
+        metrics.API_CALLS.inc(api=api, method=kwargs.get('method') or (args[1] if len(args) > 1 else 'GET'))
+        return request(*args, **kwargs)
+
+    http.request = counted
+
 
 class GoogleClient:
     _instance = None
     _creds = None
     _user_creds = None
+    _scanners = {}
+    # 进程内共享的客户端缓存：gspread 客户端与表格句柄全局一份，
+    # Drive 服务按线程缓存 (httplib2 连接非线程安全)，各自复用 keep-alive 连接
+    _lock = threading.RLock()
+    _local = threading.local()
+    _sheets_client = None
+    _production_sheet = None
 
     def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super(GoogleClient, cls).__new__(cls)
-            cls._init_creds()
+        with cls._lock:
+            if cls._instance is None:
+                instance = super(GoogleClient, cls).__new__(cls)
+                cls._init_creds()
+                cls._instance = instance
         return cls._instance
 
     @classmethod
@@ -36,22 +68,98 @@ class GoogleClient:
         else:
             raise FileNotFoundError(f"未找到 token.json 或 {Config.CREDENTIALS_FILE} 进行 API 授权。")
 
+    @classmethod
+    def _refresh_creds(cls):
+        """令牌过期时在锁内统一刷新一次，所有线程与客户端共享同一份凭据"""
+        with cls._lock:
+            if cls._user_creds:
+                if not cls._user_creds.valid and cls._user_creds.refresh_token:
+                    cls._user_creds.refresh(Request())
+            elif cls._creds.access_token is None or cls._creds.access_token_expired:
+                cls._creds.refresh(httplib2.Http())
+
     def get_sheets_client(self):
-        if self._user_creds:
-            return gspread.authorize(self._user_creds)
-        return gspread.authorize(self._creds)
+        with self._lock:
+            if self._sheets_client is None:
+                self._refresh_creds()
+                GoogleClient._sheets_client = gspread.authorize(self._user_creds or self._creds)
+            return self._sheets_client
 
     def get_drive_service(self):
-        if self._user_creds:
-            return build('drive', 'v3', credentials=self._user_creds)
-        return build('drive', 'v3', credentials=self._creds)
+        """返回当前线程缓存的 Drive 服务；使用随包附带的静态发现文档，避免重复下载与解析"""
+        self._refresh_creds()
+        service = getattr(self._local, 'drive_service', None)
+        if service is None:
+            if self._user_creds:
+                http = google_auth_httplib2.AuthorizedHttp(self._user_creds, http=httplib2.Http())
+            else:
+                http = self._creds.authorize(httplib2.Http())
+            _count_requests(http, 'drive')
+            service = build('drive', 'v3', http=http, static_discovery=True, cache_discovery=False)
+            self._local.drive_service = service
+        return service
 
     def get_production_sheet(self):
-        gc = self.get_sheets_client()
-        spreadsheet = gc.open(Config.SPREADSHEET_NAME)
-        return spreadsheet.worksheet(Config.SHEET_NAME)
+        with self._lock:
+            if self._production_sheet is None:
+                gc = self.get_sheets_client()
+                metrics.API_CALLS.inc(api='sheets', method='open')
+                spreadsheet = gc.open(Config.SPREADSHEET_NAME)
+                GoogleClient._production_sheet = spreadsheet.worksheet(Config.SHEET_NAME)
+            return self._production_sheet
+
+    @classmethod
+    def reset_cache(cls):
+        """丢弃已缓存的表格句柄 (例如表格被重命名或工作表被重建后)"""
+        with cls._lock:
+            cls._sheets_client = None
+            cls._production_sheet = None
+
+    def get_scanner(self, statuses):
+        """按状态集合复用扫描器，游标与行指纹跨轮次保留"""
+        key = tuple(statuses)
+        worksheet = self.get_production_sheet()
+        if key not in self._scanners:
+            self._scanners[key] = SheetScanner(worksheet, statuses)
+        # 句柄缓存被重置后同步到扫描器
+        self._scanners[key].worksheet = worksheet
+        return self._scanners[key]
 
-    def upload_to_drive(self, local_path, filename):
+    def invalidate_scanned_rows(self, rows):
+        """本进程写入过的行：让所有扫描器下一轮重新探测其 E 列"""
+        for scanner in self._scanners.values():
+            scanner.invalidate(rows)
+
+    def get_sheet_revision(self, spreadsheet_id):
+        """通过 Drive 元数据读取表格版本号，作为廉价的变更指纹"""
+        meta = self.get_drive_service().files().get(
+            fileId=spreadsheet_id,
+            fields='version',
+            supportsAllDrives=True
+        ).execute()
+        return meta.get('version')
+
+    def get_changes_start_token(self):
+        return self.get_drive_service().changes().getStartPageToken(supportsAllDrives=True).execute()['startPageToken']
+
+    def list_changes(self, token):
+        """从 token 起读取全部 Drive 变更，返回 (变更列表, 下一次使用的 token)"""
+        drive_service = self.get_drive_service()
+        changes = []
+        while True:
+            result = drive_service.changes().list(
+                pageToken=token,
+                fields='nextPageToken, newStartPageToken, changes(fileId, removed, file(name, parents))',
+                pageSize=1000,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute()
+            changes.extend(result.get('changes', []))
+            if 'newStartPageToken' in result:
+                return changes, result['newStartPageToken']
+            token = result['nextPageToken']
+
+    def upload_to_drive(self, local_path, filename, mimetype=None):
         """将文件上传至 Google Drive 指定文件夹"""
         drive_service = self.get_drive_service()
         file_metadata = {'name': filename}
@@ -59,7 +167,7 @@ class GoogleClient:
         if Config.DRIVE_FOLDER_ID:
             file_metadata['parents'] = [Config.DRIVE_FOLDER_ID]
             
-        media = MediaFileUpload(local_path, mimetype='audio/mpeg', resumable=True)
+        media = MediaFileUpload(local_path, mimetype=mimetype or mimetype_for(filename), resumable=True)
         file = drive_service.files().create(
             body=file_metadata,
             media_body=media,
@@ -67,3 +175,319 @@ class GoogleClient:
             supportsAllDrives=True
         ).execute()
         return file.get('id')
+
+    def upload_stream_to_drive(self, stream, filename, mimetype=None):
+        """把不可 seek 的字节流 (如 yt-dlp/FFmpeg 的 stdout) 分块续传至 Drive，不落本地文件
+
+        网络错误时由 next_chunk 向会话查询已确认的偏移量并从该处续传。
+        """
+        drive_service = self.get_drive_service()
+        file_metadata = {'name': filename}
+
+        if Config.DRIVE_FOLDER_ID:
+            file_metadata['parents'] = [Config.DRIVE_FOLDER_ID]
+
+        media = StreamingMediaUpload(stream, mimetype or mimetype_for(filename))
+        request = drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id, size',
+            supportsAllDrives=True
+        )
+        response = None
+        failures = 0
+        while response is None:
+            try:
+                _, response = request.next_chunk(num_retries=Config.UPLOAD_RETRIES)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures > Config.UPLOAD_RETRIES:
+                    raise
+                print(f"⚠️ 上传中断，将从已确认偏移量续传 ({failures}/{Config.UPLOAD_RETRIES}): {e}")
+        return response
+
+    def delete_from_drive(self, file_id):
+        self.get_drive_service().files().delete(fileId=file_id, supportsAllDrives=True).execute()
+
+    def list_drive_folder(self, folder_id, fields='id, name, size, md5Checksum, modifiedTime'):
+        """分页列出文件夹内所有文件 (每页 1000 条)"""
+        drive_service = self.get_drive_service()
+        files = []
+        page_token = None
+        while True:
+            result = drive_service.files().list(
+                q=f"'{folder_id}' in parents and trashed = false",
+                fields=f'nextPageToken, files({fields})',
+                pageSize=1000,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True
+            ).execute()
+            files.extend(result.get('files', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return files
+
+    def download_from_drive(self, file_id, dest_path, size=None, md5=None):
+        """按 HTTP Range 分段并行下载 Drive 文件，每段独立重试，完成后与 Drive 记录的 md5 校验"""
+        if size is None or md5 is None:
+            meta = self.get_drive_service().files().get(
+                fileId=file_id,
+                fields='size, md5Checksum',
+                supportsAllDrives=True
+            ).execute()
+            size = meta['size']
+            md5 = meta.get('md5Checksum')
+        size = int(size)
+        chunk = Config.DRIVE_DOWNLOAD_CHUNK_MB * 1024 * 1024
+        ranges = [(start, min(start + chunk, size) - 1) for start in range(0, size, chunk)]
+
+        tmp = f"{dest_path}.part"
+        with open(tmp, 'wb') as f:
+            f.truncate(size)
+        fd = os.open(tmp, os.O_WRONLY)
+        try:
+            with ThreadPoolExecutor(max_workers=Config.DRIVE_DOWNLOAD_WORKERS) as pool:
+                list(pool.map(lambda r: self._download_range(file_id, fd, *r), ranges))
+        except Exception:
+            os.close(fd)
+            os.remove(tmp)
+            raise
+        os.close(fd)
+
+        if md5:
+            digest = hashlib.md5()
+            with open(tmp, 'rb') as f:
+                for block in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(block)
+            if digest.hexdigest() != md5:
+                os.remove(tmp)
+                raise IOError(f"md5 校验失败: {file_id} ({digest.hexdigest()} != {md5})")
+        os.replace(tmp, dest_path)
+        return dest_path
+
+    def _download_range(self, file_id, fd, start, end):
+        for attempt in range(Config.DRIVE_DOWNLOAD_RETRIES + 1):
+            try:
+                request = self.get_drive_service().files().get_media(fileId=file_id, supportsAllDrives=True)
+                request.headers['Range'] = f'bytes={start}-{end}'
+                data = request.execute()
+                if len(data) != end - start + 1:
+                    raise IOError(f"分段长度不符: 期望 {end - start + 1}，实际 {len(data)}")
+                os.pwrite(fd, data, start)
+                return
+            except Exception as e:
+                if attempt == Config.DRIVE_DOWNLOAD_RETRIES:
+                    raise
+                print(f"⚠️ 分段 {start}-{end} 下载失败，重试 ({attempt + 1}/{Config.DRIVE_DOWNLOAD_RETRIES}): {e}")
+                time.sleep(2 ** attempt)
+
+    def find_drive_file(self, filename, folder_id=None):
+        """按文件名在指定文件夹中查找，返回文件 ID (不存在时返回 None)"""
+        name = filename.replace("\\", "\\\\").replace("'", "\\'")
+        query = f"name = '{name}' and trashed = false"
+        if folder_id:
+            query += f" and '{folder_id}' in parents"
+        result = self.get_drive_service().files().list(
+            q=query,
+            fields='files(id)',
+            pageSize=1,
+            supportsAllDrives=True,
+            includeItemsFromAllDrives=True
+        ).execute()
+        files = result.get('files', [])
+        return files[0]['id'] if files else None
+
+    def put_bytes_to_drive(self, data, filename, folder_id=None, mimetype='application/octet-stream'):
+        """上传内存中的小文件；同名文件已存在时覆盖内容而非新建副本"""
+        drive_service = self.get_drive_service()
+        media = MediaInMemoryUpload(data, mimetype=mimetype)
+        file_id = self.find_drive_file(filename, folder_id)
+        if file_id:
+            drive_service.files().update(
+                fileId=file_id,
+                media_body=media,
+                supportsAllDrives=True
+            ).execute()
+            return file_id
+        file_metadata = {'name': filename}
+        if folder_id:
+            file_metadata['parents'] = [folder_id]
+        file = drive_service.files().create(
+            body=file_metadata,
+            media_body=media,
+            fields='id',
+            supportsAllDrives=True
+        ).execute()
+        return file.get('id')
+
+    def get_bytes_from_drive(self, file_id):
+        """下载小文件的完整内容"""
+        return self.get_drive_service().files().get_media(
+            fileId=file_id,
+            supportsAllDrives=True
+        ).execute()
+
+
+class SheetScanner:
+    """增量扫描 Production 表
+
+    只拉取 A:C 列；E 列仅对处于流水线状态且指纹未知的行按需探测是否为空。
+    游标指向第一个仍处于流水线中的行，之前的区域在常规扫描中跳过，
+    每 SCAN_FULL_EVERY 轮从第 2 行全量重扫一次，以捕获人工重置的旧行；
+    全量重扫时重新探测缓存为“E 列为空”的行 (空单元格读取几乎无开销)，捕获 A:C 未变而 E 被其他节点写入的行。
+    已确认 E 列有内容的行在 A:C 不变时不再读取 E 列 (否则每次全量扫描都要下载全部字幕)；
+    本进程回推的行由 invalidate() 失效。A:C 不变而仅清空 E 列不会被发现，人工重新排队时需同时改写 C 列状态。
+    表格版本号未变化时直接复用上一轮结果。
+    """
+
+    PROBE_BATCH = 200
+
+    def __init__(self, worksheet, statuses, full_scan_every=None):
+        self.worksheet = worksheet
+        self.statuses = set(statuses)
+        self.full_scan_every = full_scan_every or Config.SCAN_FULL_EVERY
+        self.cursor = 2
+        self._known = {}  # row -> ((A, B, C), E 是否已有内容)
+        self._revision = None
+        self._last_result = None
+        self._scan_count = 0
+        self.last_scan = None  # 'full' / 'incremental' / 'cached'，供基准测试与日志区分
+
+    def _spreadsheet_id(self):
+        return getattr(self.worksheet, 'spreadsheet_id', None) or self.worksheet.spreadsheet.id
+
+    def _current_revision(self):
+        try:
+            return GoogleClient().get_sheet_revision(self._spreadsheet_id())
+        except Exception:
+            return None
+
+    def _is_candidate(self, i, row):
+        return bool(row[1]) and row[2] in self.statuses and self._known[i][1] is False
+
+    def _probe_transcripts(self, row_indexes, rows_by_index):
+        """批量读取 E 列，仅记录是否为空；返回新确认的候选行数"""
+        found = 0
+        metrics.API_CALLS.inc(api='sheets', method='batch_get')
+        results = self.worksheet.batch_get([f"E{i}" for i in row_indexes])
+        for i, value_range in zip(row_indexes, results):
+            filled = bool(value_range and value_range[0] and value_range[0][0])
+            self._known[i] = (self._known[i][0], filled)
+            if self._is_candidate(i, rows_by_index[i]):
+                found += 1
+        return found
+
+    def scan(self, limit=None):
+        """返回 [(行号, [url, video_id, status]), ...]，状态匹配且 E 列为空"""
+        revision = self._current_revision()
+        if revision is not None and revision == self._revision and self._last_result is not None:
+            self.last_scan = 'cached'
+            return self._filter(self._last_result, limit)
+        self._revision = revision
+
+        full_scan = self._scan_count % self.full_scan_every == 0
+        self._scan_count += 1
+        self.last_scan = 'full' if full_scan else 'incremental'
+        start = 2 if full_scan else self.cursor
+        metrics.API_CALLS.inc(api='sheets', method='get')
+        values = self.worksheet.get(f"A{start}:C")
+
+        rows = []
+        for offset, raw in enumerate(values):
+            i = start + offset
+            row = (list(raw) + ["", "", ""])[:3]
+            fingerprint = tuple(row)
+            known = self._known.get(i)
+            if known is None or known[0] != fingerprint or (full_scan and known[1] is False):
+                self._known[i] = (fingerprint, None)
+            rows.append((i, row))
+        rows_by_index = dict(rows)
+
+        # 仅探测处于流水线中且 E 列状态未知的行，凑够 limit 个候选即停止
+        pending = []
+        found = 0
+        for i, row in rows:
+            if limit is not None and found >= limit:
+                break
+            if row[2] not in ACTIVE_STATUSES:
+                continue
+            if self._known[i][1] is None:
+                pending.append(i)
+                if len(pending) >= self.PROBE_BATCH:
+                    found += self._probe_transcripts(pending, rows_by_index)
+                    pending = []
+            elif self._is_candidate(i, row):
+                found += 1
+        if pending:
+            self._probe_transcripts(pending, rows_by_index)
+
+        # 游标前进到第一个仍在流水线中的行
+        cursor = start + len(values)
+        for i, row in rows:
+            if row[2] in ACTIVE_STATUSES and self._known[i][1] is not True:
+                cursor = i
+                break
+        self.cursor = cursor
+
+        self._last_result = rows
+        return self._filter(rows, limit)
+
+    def invalidate(self, rows):
+        """丢弃指定行的缓存指纹与 E 列状态"""
+        for row in rows:
+            self._known.pop(row, None)
+        self._last_result = None
+
+    def _filter(self, rows, limit):
+        result = []
+        for i, row in rows:
+            if limit is not None and len(result) >= limit:
+                break
+            if self._is_candidate(i, row):
+                result.append((i, list(row)))
+        return result
+
+
+class StreamingMediaUpload(MediaUpload):
+    """以未知总长度进行可续传上传的流式数据源
+
+    只在内存中保留尚未被服务端确认的最后一个分块，读到短块即视为流结束。
+    """
+
+    def __init__(self, stream, mimetype, chunksize=None):
+        super().__init__()
+        self._stream = stream
+        self._mimetype = mimetype
+        self._chunksize = chunksize or Config.UPLOAD_CHUNK_SIZE
+        self._buffer = b''
+        self._offset = 0  # _buffer[0] 对应的流偏移量
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return None
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def getbytes(self, begin, length):
+        if begin < self._offset:
+            raise ValueError(f"无法回退到已丢弃的偏移量 {begin} (缓冲起点 {self._offset})")
+        # 服务端已确认 begin 之前的字节，可以释放
+        self._buffer = self._buffer[begin - self._offset:]
+        self._offset = begin
+        while len(self._buffer) < length:
+            data = self._stream.read(length - len(self._buffer))
+            if not data:
+                break
+            self._buffer += data
+        return self._buffer[:length]
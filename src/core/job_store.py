@@ -0,0 +1,283 @@
+import sqlite3
+import threading
+import time
+from src.core import metrics
+from src.core.config import Config
+from src.core.google_api import GoogleClient
+from src.core.lease import RowLease
+from src.core.sheet_writer import SheetWriter
+from src.core.transcript_store import cell_value
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    video_id TEXT PRIMARY KEY,
+    url TEXT,
+    sheet_row INTEGER,
+    status TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    transcript TEXT,
+    speech_ratio REAL,
+    duration REAL,
+    size_estimate INTEGER,
+    has_captions INTEGER,
+    priority INTEGER,
+    created_at REAL,
+    updated_at REAL,
+    status_dirty INTEGER NOT NULL DEFAULT 0,
+    transcript_dirty INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, sheet_row);
+"""
+
+# 仅保存在本地、不回推表格的列
+LOCAL_FIELDS = {"speech_ratio", "duration", "size_estimate", "has_captions", "priority"}
+
+# 旧库升级：后续新增的列 (列名, 类型)
+MIGRATIONS = [
+    ("speech_ratio", "REAL"),
+    ("duration", "REAL"),
+    ("size_estimate", "INTEGER"),
+    ("has_captions", "INTEGER"),
+    ("priority", "INTEGER"),
+]
+
+
+class JobStore:
+    """本地 SQLite 任务镜像：工作进程只读写本地，状态变更由 SheetSync 批量回推表格"""
+
+    def __init__(self, path=None):
+        self.path = path or Config.JOB_DB_PATH
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+            for name, kind in MIGRATIONS:
+                if name not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def get(self, video_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def next_jobs(self, status, limit=None):
+        """按表格行序取出指定状态且尚无字幕 (E 列为空) 的任务"""
+        sql = "SELECT * FROM jobs WHERE status = ? AND transcript IS NULL ORDER BY sheet_row"
+        params = [status]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params)]
+
+    def start_attempt(self, video_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET attempts = attempts + 1, updated_at = ? WHERE video_id = ?",
+                (time.time(), video_id)
+            )
+
+    def update(self, video_id, status=None, transcript=None, **fields):
+        """本地更新任务状态/字幕，并标记为待回推；fields 为仅保存在本地的列 (如 speech_ratio)"""
+        sets = ["updated_at = ?"]
+        params = [time.time()]
+        for name, value in fields.items():
+            if name not in LOCAL_FIELDS:
+                raise ValueError(f"未知的任务字段: {name}")
+            sets.append(f"{name} = ?")
+            params.append(value)
+        if status is not None:
+            sets += ["status = ?", "status_dirty = 1"]
+            params.append(status)
+        if transcript is not None:
+            sets += ["transcript = ?", "transcript_dirty = 1"]
+            params.append(transcript)
+        params.append(video_id)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(sets)} WHERE video_id = ?", params)
+
+    def merge_from_sheet(self, rows, statuses):
+        """合并表格扫描结果；本地尚未回推的变更优先于远端状态
+
+        rows 为 SheetScanner.scan() 的完整结果 (均为 E 列为空的行)，本地已回推的字幕随之清空，
+        以便人工清空 E 列重新排队的行再次被处理。本地处于 statuses 且未变更、
+        但已不在扫描结果中的任务说明已被外部处理，从本地队列移除。
+        """
+        now = time.time()
+        seen = set()
+        with self._lock, self._conn:
+            for sheet_row, (url, video_id, status) in rows:
+                seen.add(video_id)
+                self._conn.execute(
+                    """
+                    INSERT INTO jobs (video_id, url, sheet_row, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(video_id) DO UPDATE SET
+                        url = excluded.url,
+                        sheet_row = excluded.sheet_row,
+                        status = CASE WHEN status_dirty THEN status ELSE excluded.status END,
+                        -- 扫描结果只含 E 列为空的行：已回推的旧字幕说明该行被人工重新排队，清空本地副本
+                        transcript = CASE WHEN transcript_dirty THEN transcript ELSE NULL END,
+                        updated_at = CASE WHEN status_dirty THEN updated_at ELSE excluded.updated_at END
+                    """,
+                    (video_id, url, sheet_row, status, now, now)
+                )
+            placeholders = ", ".join("?" for _ in statuses)
+            stale = [
+                r["video_id"] for r in self._conn.execute(
+                    f"SELECT video_id FROM jobs WHERE status IN ({placeholders}) AND status_dirty = 0",
+                    list(statuses)
+                )
+                if r["video_id"] not in seen
+            ]
+            self._conn.executemany("DELETE FROM jobs WHERE video_id = ?", [(v,) for v in stale])
+        return len(seen), len(stale)
+
+    def set_priorities(self, priorities):
+        """批量写入表格优先级列的值 {video_id: priority}"""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE jobs SET priority = ? WHERE video_id = ?",
+                [(p, v) for v, p in priorities.items()]
+            )
+
+    def dirty_jobs(self):
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(
+                "SELECT * FROM jobs WHERE status_dirty = 1 OR transcript_dirty = 1 ORDER BY sheet_row"
+            )]
+
+    def mark_synced(self, jobs):
+        """仅清除推送时快照中的脏标记，推送期间新产生的变更保留"""
+        with self._lock, self._conn:
+            for job in jobs:
+                self._conn.execute(
+                    """
+                    UPDATE jobs SET
+                        status_dirty = CASE WHEN status = ? THEN 0 ELSE status_dirty END,
+                        transcript_dirty = CASE WHEN transcript IS ? THEN 0 ELSE transcript_dirty END
+                    WHERE video_id = ?
+                    """,
+                    (job["status"], job["transcript"], job["video_id"])
+                )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SheetSync:
+    """本地任务库与 Production 表的双向同步
+
+    pull: 增量扫描表格，把新的待处理行并入本地库。
+    push: 把本地脏状态/字幕合并为一次 batch_update 回推 (字幕按配置先写入外置存储)。
+    表格不可用时两者只打印告警，工作进程继续使用本地库。
+    PRIORITY_COLUMN 非空时 pull 顺带读取排队任务的优先级，供 planner 排序。
+    ROW_LEASING 开启时 claim() 通过租约列认领任务，多个节点共享同一张表不会重复处理。
+    """
+
+    def __init__(self, store, statuses, interval=None):
+        self.store = store
+        self.statuses = list(statuses)
+        self.interval = interval or Config.SYNC_INTERVAL
+        self.lease = RowLease() if Config.ROW_LEASING else None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def claim(self, jobs, limit=None):
+        """认领本轮要处理的任务；未开启租约时直接按顺序截取"""
+        if self.lease is None:
+            return jobs if limit is None else jobs[:limit]
+        try:
+            return self.lease.claim(jobs, limit)
+        except Exception as e:
+            # 无法确认归属时宁可本轮空转，也不与其他节点重复处理
+            print(f"⚠️ 任务认领失败，本轮跳过: {e}")
+            return []
+
+    def held(self, video_id):
+        """本节点是否仍持有该任务；租约续期时发现已被其他节点接手则返回 False"""
+        return self.lease is None or self.lease.held(video_id)
+
+    def release(self, video_ids):
+        """归还已认领但本轮不再处理的任务"""
+        if self.lease is not None and video_ids:
+            self.lease.release(video_ids)
+
+    def pull(self):
+        try:
+            google = GoogleClient()
+            rows = google.get_scanner(self.statuses).scan()
+            merged, removed = self.store.merge_from_sheet(rows, self.statuses)
+            print(f"🔄 已同步表格任务 {merged} 条 (移出 {removed} 条)")
+            if Config.PRIORITY_COLUMN:
+                self._pull_priorities(google.get_production_sheet())
+        except Exception as e:
+            print(f"⚠️ 表格拉取失败，继续使用本地任务库: {e}")
+
+    def _pull_priorities(self, worksheet):
+        """只读取排队任务所在行的优先级单元格 (一次 batch_get)；空白或非数字视为 0"""
+        jobs = [job for status in self.statuses for job in self.store.next_jobs(status)]
+        if not jobs:
+            return
+        metrics.API_CALLS.inc(api='sheets', method='batch_get')
+        results = worksheet.batch_get([f"{Config.PRIORITY_COLUMN}{job['sheet_row']}" for job in jobs])
+        priorities = {}
+        for job, value_range in zip(jobs, results):
+            try:
+                priorities[job["video_id"]] = int(float(value_range[0][0]))
+            except (IndexError, TypeError, ValueError):
+                priorities[job["video_id"]] = 0
+        self.store.set_priorities(priorities)
+
+    def push(self):
+        jobs = self.store.dirty_jobs()
+        if not jobs:
+            return 0
+        try:
+            with SheetWriter(GoogleClient().get_production_sheet(), max_pending=len(jobs) + 1) as writer:
+                for job in jobs:
+                    if job["transcript_dirty"]:
+                        # 启用外置存储时 E 列只写预览 + 指针
+                        writer.update_cell(job["sheet_row"], 5, cell_value(job["video_id"], job["transcript"]))
+                    if job["status_dirty"]:
+                        writer.update_cell(job["sheet_row"], 3, job["status"])
+        except Exception as e:
+            print(f"⚠️ 状态回推失败，将在下次同步重试: {e}")
+            return 0
+        self.store.mark_synced(jobs)
+        # 写入 E 列时 A:C 指纹可能不变，需让扫描器重新探测这些行
+        GoogleClient().invalidate_scanned_rows([job["sheet_row"] for job in jobs])
+        return len(jobs)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self.lease is not None:
+                self.lease.renew()
+            self.push()
+            self.pull()
+
+    def start(self):
+        """启动后台周期同步线程"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sheet-sync", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止后台同步，做最后一次回推，并在状态全部回推后释放租约"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.push()
+        if self.lease is not None:
+            if self.store.dirty_jobs():
+                # 状态尚未写回表格，保留租约直至过期，避免其他节点重复处理
+                print(f"⚠️ 仍有未回推的状态，租约将在 {self.lease.ttl} 秒后过期")
+            else:
+                self.lease.release()
@@ -0,0 +1,175 @@
+import socket
+import threading
+import time
+from src.core import metrics
+from src.core.config import Config
+from src.core.google_api import GoogleClient
+
+
+class LeaseLost(Exception):
+    """本节点持有的行租约已过期或被其他节点接手"""
+
+
+def _parse(cell):
+    """'<node_id>@<到期时间戳>' -> (node_id, expiry)；空单元格或格式不符返回 (None, 0)"""
+    owner, sep, expiry = (cell or "").rpartition('@')
+    if not sep:
+        return None, 0
+    try:
+        return owner, float(expiry)
+    except ValueError:
+        return None, 0
+
+
+class RowLease:
+    """基于表格租约列的行级认领，允许多个 LA/HK 节点共享同一张表而不重复处理
+
+    Sheets 不支持条件写入，认领采用“读-写-等待-复读”的乐观协议：
+    1. 批量读取候选行的租约列，跳过他人持有且未过期的行；
+    2. 一次 batch_update 写入 '<NODE_ID>@<到期时间>'；
+    3. 等待 LEASE_SETTLE_SECONDS 让并发写入落定后复读，仍为本节点的行才算认领成功。
+    两个节点同时写同一行时后写者胜出，先写者在复读时发现并放弃。
+    从读取到写入完成超过 LEASE_SETTLE_SECONDS 的一轮整体放弃 (并清除仍为本节点的单元格)：
+    迟到的写入可能落在对方复读之后，不能据此认为认领成功。
+    续期与释放同样先复读，只处理仍显示本节点令牌的行；已过期或被其他节点接手的行记为丢失，
+    工作进程通过 held() 得知后放弃该任务。续期只在剩余时间不足一半时写入，减少表格版本变化。
+    节点崩溃后租约在 LEASE_TTL 秒后过期，其他节点可重新认领。
+    """
+
+    def __init__(self, node_id=None, ttl=None, column=None, settle_seconds=None):
+        self.node_id = node_id or Config.NODE_ID or socket.gethostname()
+        self.ttl = ttl or Config.LEASE_TTL
+        self.column = column or Config.LEASE_COLUMN
+        self.settle_seconds = Config.LEASE_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self._held = {}  # video_id -> (sheet_row, 租约到期时间)
+        self._lost = set()
+        self._lock = threading.Lock()
+
+    def _cell(self, row):
+        return f"{self.column}{row}"
+
+    def _read(self, rows):
+        worksheet = GoogleClient().get_production_sheet()
+        metrics.API_CALLS.inc(api='sheets', method='batch_get')
+        results = worksheet.batch_get([self._cell(row) for row in rows])
+        return [
+            value_range[0][0] if value_range and value_range[0] else ""
+            for value_range in results
+        ]
+
+    def _write(self, rows, value):
+        if not rows:
+            return
+        worksheet = GoogleClient().get_production_sheet()
+        metrics.API_CALLS.inc(api='sheets', method='batch_update')
+        worksheet.batch_update(
+            [{'range': self._cell(row), 'values': [[value]]} for row in rows],
+            value_input_option='RAW'
+        )
+
+    def _token(self, now=None):
+        return f"{self.node_id}@{int((now or time.time()) + self.ttl)}"
+
+    def held(self, video_id):
+        """本节点是否仍持有该行；续期时发现租约已丢失则返回 False"""
+        with self._lock:
+            return video_id not in self._lost
+
+    def claim(self, jobs, limit=None):
+        """从 jobs 中按顺序认领至多 limit 个，返回认领成功的任务"""
+        limit = len(jobs) if limit is None else limit
+        claimed = []
+        candidates = list(jobs)
+        # 与其他节点撞车时再用剩余的空闲行补一轮
+        for _ in range(2):
+            if len(claimed) >= limit or not candidates:
+                break
+            read_at = time.time()
+            free = []
+            for job, cell in zip(candidates, self._read([job["sheet_row"] for job in candidates])):
+                owner, expiry = _parse(cell)
+                if owner is None or owner == self.node_id or expiry < read_at:
+                    free.append(job)
+            attempt = free[:limit - len(claimed)]
+            if not attempt:
+                break
+            token = self._token(read_at)
+            self._write([job["sheet_row"] for job in attempt], token)
+            late = time.time() - read_at > self.settle_seconds
+            time.sleep(self.settle_seconds)
+            mine = [
+                job for job, cell in zip(attempt, self._read([job["sheet_row"] for job in attempt]))
+                if cell == token
+            ]
+            if late:
+                # 写入晚于其他节点的复读窗口，无法确认独占，放弃本轮并清除自己的令牌
+                print(f"⚠️ 租约写入耗时超过 {self.settle_seconds} 秒，放弃本次认领")
+                self._write([job["sheet_row"] for job in mine], "")
+                break
+            won = mine
+            with self._lock:
+                for job in won:
+                    self._held[job["video_id"]] = (job["sheet_row"], read_at + self.ttl)
+                    self._lost.discard(job["video_id"])
+            claimed += won
+            lost = len(attempt) - len(won)
+            if lost:
+                print(f"🔒 {lost} 行已被其他节点认领")
+            candidates = free[len(attempt):]
+        return claimed
+
+    def _still_mine(self, held, now):
+        """复读 held {video_id: (row, expiry)}，返回 (仍由本节点持有的 video_id, 已丢失的 video_id)"""
+        mine, lost = [], []
+        cells = self._read([row for row, _ in held.values()])
+        for (video_id, (_, expiry)), cell in zip(held.items(), cells):
+            owner, cell_expiry = _parse(cell)
+            if owner == self.node_id and cell_expiry == int(expiry) and expiry > now:
+                mine.append(video_id)
+            else:
+                lost.append(video_id)
+        return mine, lost
+
+    def _mark_lost(self, video_ids):
+        if not video_ids:
+            return
+        with self._lock:
+            for video_id in video_ids:
+                self._held.pop(video_id, None)
+                self._lost.add(video_id)
+        print(f"⚠️ {len(video_ids)} 行租约已过期或被其他节点接手，放弃处理: {', '.join(video_ids)}")
+
+    def renew(self):
+        """延长剩余时间不足一半的租约；先复读，只续期仍显示本节点令牌且未过期的行"""
+        now = time.time()
+        with self._lock:
+            due = {v: h for v, h in self._held.items() if h[1] - now < self.ttl / 2}
+        if not due:
+            return
+        try:
+            # 剩余时间不足以在过期前完成写入的行同样视为丢失
+            mine, lost = self._still_mine(due, now + self.settle_seconds)
+            self._mark_lost(lost)
+            read_at = now
+            self._write([due[v][0] for v in mine], self._token(read_at))
+            if time.time() - read_at > self.settle_seconds:
+                print(f"⚠️ 租约续期写入耗时超过 {self.settle_seconds} 秒，下次续期时复核归属")
+            with self._lock:
+                for video_id in mine:
+                    if video_id in self._held:
+                        self._held[video_id] = (due[video_id][0], read_at + self.ttl)
+        except Exception as e:
+            print(f"⚠️ 租约续期失败: {e}")
+
+    def release(self, video_ids=None):
+        """释放指定 (默认全部) 租约；只清除仍为本节点令牌的单元格，失败时等待其自然过期"""
+        with self._lock:
+            ids = list(self._held) if video_ids is None else [v for v in video_ids if v in self._held]
+            held = {v: self._held.pop(v) for v in ids}
+        if not held:
+            return
+        try:
+            mine, _ = self._still_mine(held, time.time())
+            self._write([held[v][0] for v in mine], "")
+        except Exception as e:
+            print(f"⚠️ 租约释放失败，将在 {self.ttl} 秒后过期: {e}")
@@ -0,0 +1,79 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import yt_dlp
+from src.core.config import Config
+from src.core.rate_limit import TokenBucket
+
+
+def _has_captions(info, languages):
+    """info 中是否列出目标语言的人工或自动字幕"""
+    tracks = set(info.get('subtitles') or {}) | set(info.get('automatic_captions') or {})
+    return any(lang in tracks for lang in languages)
+
+
+class MetadataProber:
+    """视频元数据预取：yt-dlp 只解析信息不下载，批量并发获取时长、音频大小估算与字幕可用性
+
+    结果写入本地任务库 (duration / size_estimate / has_captions)，供 planner 按音频分钟预算排序；
+    has_captions 为 0 的视频不再做官方字幕探测。
+    每次解析都先从独立的令牌桶 (METADATA_MIN_DELAY~METADATA_MAX_DELAY) 取得许可，保持对 YouTube 的请求节奏；
+    解析失败或时长未知 (如直播中) 的视频按指数退避延后重试，不会每轮重复请求。
+    """
+
+    RETRY_BASE = 600
+    RETRY_MAX = 6 * 3600
+
+    def __init__(self, languages=None, workers=None, limiter=None):
+        self.languages = languages or Config.CAPTION_LANGUAGES
+        self.workers = workers or Config.METADATA_WORKERS
+        self.limiter = limiter or TokenBucket(Config.METADATA_MIN_DELAY, Config.METADATA_MAX_DELAY)
+        self._opts = {'format': 'm4a/bestaudio/best', 'quiet': True, 'skip_download': True}
+        self._failures = {}  # video_id -> (连续失败次数, 下次重试时间)
+
+    def _due(self, video_id, now):
+        failure = self._failures.get(video_id)
+        return failure is None or failure[1] <= now
+
+    def _failed(self, video_id, now):
+        count = self._failures.get(video_id, (0, 0))[0] + 1
+        delay = min(self.RETRY_BASE * 2 ** (count - 1), self.RETRY_MAX)
+        self._failures[video_id] = (count, now + delay)
+
+    def _fetch(self, url):
+        self.limiter.acquire()
+        try:
+            with yt_dlp.YoutubeDL(self._opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+        except Exception:
+            # 会员专享 / 已删除 / 风控等情况交给下载阶段处理
+            return None
+        size = info.get('filesize') or info.get('filesize_approx')
+        return {
+            'duration': info.get('duration'),
+            'size_estimate': int(size) if size else None,
+            'has_captions': int(_has_captions(info, self.languages)),
+        }
+
+    def probe(self, store, jobs):
+        """补齐 jobs 中尚无时长的任务 (每轮至多 METADATA_BATCH 条)；原地更新并返回 jobs"""
+        now = time.time()
+        missing = [
+            job for job in jobs
+            if job.get("duration") is None and self._due(job["video_id"], now)
+        ][:Config.METADATA_BATCH]
+        if not missing:
+            return jobs
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            infos = list(pool.map(self._fetch, [job["url"] for job in missing]))
+        found = 0
+        now = time.time()
+        for job, info in zip(missing, infos):
+            if info is None or info['duration'] is None:
+                self._failed(job["video_id"], now)
+                continue
+            self._failures.pop(job["video_id"], None)
+            store.update(job["video_id"], **info)
+            job.update(info)
+            found += 1
+        print(f"🧾 元数据预取: {found}/{len(missing)} 条")
+        return jobs
@@ -0,0 +1,160 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from src.core.config import Config
+
+# 默认延迟分桶 (秒)：覆盖从 Sheets 单次请求到长视频下载/转录
+DEFAULT_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+
+def _labels_text(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{k}="{str(v)}"' for k, v in sorted(labels))
+    return "{" + pairs + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels_text(k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = value
+
+    def render(self):
+        with self._lock:
+            items = list(self._values.items())
+        return self._header() + [f"{self.name}{_labels_text(k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value, count + 1)
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(k, list(c), s, n) for k, (c, s, n) in self._values.items()]
+        for key, counts, total, count in items:
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels_text(key + (('le', bound),))} {n}")
+            lines.append(f"{self.name}_bucket{_labels_text(key + (('le', '+Inf'),))} {count}")
+            lines.append(f"{self.name}_sum{_labels_text(key)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(key)} {count}")
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.monotonic() - self.start, **self.labels)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# 流水线各阶段 (LA: download/transcode/upload/stream；HK: transcribe)
+STAGE_SECONDS = REGISTRY.register(Histogram('ytt_stage_seconds', '单条任务在各阶段的耗时'))
+QUEUE_DEPTH = REGISTRY.register(Gauge('ytt_queue_depth', '各阶段输入队列当前深度'))
+JOBS = REGISTRY.register(Counter('ytt_jobs_total', '按结果统计的任务数'))
+# LA 节点
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram('ytt_rate_limit_wait_seconds', '下载前等待令牌桶的时间'))
+BYTES_DOWNLOADED = REGISTRY.register(Counter('ytt_downloaded_bytes_total', '从 YouTube 下载的字节数'))
+BYTES_UPLOADED = REGISTRY.register(Counter('ytt_uploaded_bytes_total', '上传至 Drive/rclone 的字节数'))
+# HK 节点：转录速度 (实时倍数) = rate(audio_seconds) / rate(busy_seconds)；基准测试中的 RTF 为其倒数
+WHISPER_AUDIO_SECONDS = REGISTRY.register(Counter('ytt_whisper_audio_seconds_total', '已转录的音频时长 (秒)'))
+WHISPER_BUSY_SECONDS = REGISTRY.register(Counter('ytt_whisper_busy_seconds_total', '转录耗费的墙钟时间 (秒，多进程累加)'))
+WHISPER_SPEED = REGISTRY.register(Gauge('ytt_whisper_speed_x_realtime', '最近一条转录的实时倍数 (音频秒数 / 墙钟秒数)'))
+# Google API 调用次数 (配额监控)
+API_CALLS = REGISTRY.register(Counter('ytt_google_api_calls_total', 'Google Sheets/Drive API 请求数'))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        # 抓取请求不写入 task.log
+        pass
+
+
+def start_server(port, host=None):
+    """在后台线程中提供 Prometheus 文本格式的 /metrics；port 为 0 时不启动"""
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host or Config.METRICS_HOST, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 指标端点: http://{server.server_address[0]}:{port}/metrics")
+    return server
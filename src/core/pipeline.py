@@ -0,0 +1,147 @@
+import queue
+import threading
+import time
+from src.core import metrics
+
+_DONE = object()
+
+
+class Stage:
+    """流水线中的一个阶段：独立的工作线程数与有界输入队列"""
+
+    def __init__(self, name, func, workers=1, queue_size=4):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.peak_queue_depth = 0
+        self._alive = self.workers
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        self.queue.put(item)
+        if item is not _DONE:
+            depth = self.queue.qsize()
+            metrics.QUEUE_DEPTH.set(depth, stage=self.name)
+            with self._lock:
+                self.peak_queue_depth = max(self.peak_queue_depth, depth)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'stage': self.name,
+                'workers': self.workers,
+                'queue_depth': self.queue.qsize(),
+                'peak_queue_depth': self.peak_queue_depth,
+                'processed': self.processed,
+                'failed': self.failed,
+                'busy_seconds': round(self.busy_seconds, 2),
+            }
+
+
+class Pipeline:
+    """由有界队列串联的多阶段流水线
+
+    每个阶段的 func(item) 返回值交给下一阶段；抛出异常时调用 on_error(stage, item, exc)
+    并丢弃该条目。队列满时上游阻塞，形成背压，避免本地磁盘被积压的中间文件占满。
+    """
+
+    def __init__(self, stages, on_error=None):
+        self.stages = stages
+        self.on_error = on_error
+        self.completed = []
+        self._lock = threading.Lock()
+
+    def _worker(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _DONE:
+                break
+            metrics.QUEUE_DEPTH.set(stage.queue.qsize(), stage=stage.name)
+            start = time.monotonic()
+            try:
+                result = stage.func(item)
+                ok = True
+            except Exception as e:
+                ok = False
+                if self.on_error:
+                    try:
+                        self.on_error(stage.name, item, e)
+                    except Exception as callback_error:
+                        # 回调失败不能中断工作线程，否则下游收不到结束标记
+                        print(f"⚠️ 错误回调执行失败 ({stage.name}): {callback_error}")
+            elapsed = time.monotonic() - start
+            metrics.STAGE_SECONDS.observe(elapsed, stage=stage.name)
+            with stage._lock:
+                stage.busy_seconds += elapsed
+                if ok:
+                    stage.processed += 1
+                else:
+                    stage.failed += 1
+            if not ok:
+                continue
+            if next_stage is not None:
+                next_stage.put(result)
+            else:
+                with self._lock:
+                    self.completed.append(result)
+
+        # 本阶段最后一个退出的线程负责通知下游结束
+        with stage._lock:
+            stage._alive -= 1
+            last = stage._alive == 0
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.put(_DONE)
+
+    def run(self, items, report_interval=None):
+        """阻塞运行直至所有条目流经全部阶段，返回成功完成的条目
+
+        report_interval 不为空时，运行期间按该间隔打印各阶段队列深度与忙碌时间。
+        """
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                t = threading.Thread(
+                    target=self._worker, args=(index,),
+                    name=f"{stage.name}-{n}", daemon=True
+                )
+                t.start()
+                threads.append(t)
+
+        finished = threading.Event()
+        if report_interval:
+            threading.Thread(
+                target=self._monitor, args=(finished, report_interval),
+                name="pipeline-monitor", daemon=True
+            ).start()
+
+        head = self.stages[0]
+        for item in items:
+            head.put(item)
+        for _ in range(head.workers):
+            head.put(_DONE)
+
+        for t in threads:
+            t.join()
+        finished.set()
+        return self.completed
+
+    def _monitor(self, finished, interval):
+        while not finished.wait(interval):
+            self.report()
+
+    def stats(self):
+        return [stage.stats() for stage in self.stages]
+
+    def report(self):
+        for s in self.stats():
+            print(
+                f"📊 [{s['stage']}] 线程 {s['workers']} | 队列 {s['queue_depth']} (峰值 {s['peak_queue_depth']}) | "
+                f"完成 {s['processed']} | 失败 {s['failed']} | 忙碌 {s['busy_seconds']:.1f}s"
+            )
@@ -0,0 +1,52 @@
+import time
+from src.core.config import Config
+
+
+def job_minutes(job):
+    """任务的音频分钟数；时长未知时按 SCHEDULE_DEFAULT_MINUTES 计"""
+    duration = job.get("duration")
+    return duration / 60 if duration else Config.SCHEDULE_DEFAULT_MINUTES
+
+
+def order_jobs(jobs, order=None, now=None):
+    """按 SCHEDULE_ORDER 排序候选任务
+
+    sheet: 保持表格行序；shortest: 短视频优先；priority: 先按优先级列降序，同级短视频优先。
+    排队超过 SCHEDULE_MAX_WAIT_HOURS 的任务无论长短都排在最前 (按行序)，避免长视频被持续推后。
+    """
+    order = order or Config.SCHEDULE_ORDER
+    if order == 'sheet':
+        return list(jobs)
+    now = now or time.time()
+    max_wait = Config.SCHEDULE_MAX_WAIT_HOURS * 3600
+
+    def key(job):
+        overdue = bool(max_wait) and now - (job.get("created_at") or now) > max_wait
+        if overdue:
+            return (0, 0, 0, job["sheet_row"])
+        priority = (job.get("priority") or 0) if order == 'priority' else 0
+        return (1, -priority, job_minutes(job), job["sheet_row"])
+
+    return sorted(jobs, key=key)
+
+
+def take_budget(jobs, budget_minutes, limit=None):
+    """按音频分钟预算截取本轮任务，返回 (本轮处理, 留待下轮)
+
+    按 jobs 的顺序装入，放不下的跳过并继续尝试后面较短的任务；
+    排在第一的任务总会入选，超出预算的超长视频单独占用一轮。budget_minutes 为 0 时只按 limit 截取。
+    """
+    selected, rest = [], []
+    total = 0.0
+    for job in jobs:
+        minutes = job_minutes(job)
+        full = limit is not None and len(selected) >= limit
+        over = bool(selected) and budget_minutes and total + minutes > budget_minutes
+        if full or over:
+            rest.append(job)
+            continue
+        selected.append(job)
+        total += minutes
+    if rest:
+        print(f"⏱️ 本轮预算 {budget_minutes or '不限'} 分钟: 选入 {len(selected)} 条 (约 {total:.0f} 分钟)，{len(rest)} 条留待下轮")
+    return selected, rest
@@ -0,0 +1,119 @@
+import os
+import queue
+import shutil
+import threading
+from src.core.config import Config
+
+
+class AudioPrefetcher:
+    """把即将转录的音频从 rclone 挂载预先复制到本地缓冲目录
+
+    后台线程按任务顺序依次复制，当前文件转录时后续文件已在本地；
+    缓冲区最多保留 depth 个文件 / max_bytes 字节，转录结束后 release() 删除。
+    单个文件复制失败时回退为直接读取挂载路径。
+    来源为 Drive 文件元数据 (DriveAudioInventory) 时改为分段并行下载，失败的文件本轮跳过。
+    """
+
+    def __init__(self, spool_dir=None, depth=None, max_bytes=None):
+        self.spool_dir = spool_dir or Config.PREFETCH_DIR
+        self.depth = depth or Config.PREFETCH_DEPTH
+        self.max_bytes = max_bytes or Config.PREFETCH_MAX_MB * 1024 * 1024
+        self._cond = threading.Condition()
+        self._spooled = {}  # video_id -> (本地路径, 字节数)
+        self._stop = threading.Event()
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    def _spool_bytes(self):
+        return sum(size for _, size in self._spooled.values())
+
+    def _has_room(self, size):
+        # 缓冲区为空时总是放行，避免单个超大文件永远等不到空间
+        if not self._spooled:
+            return True
+        return len(self._spooled) < self.depth and self._spool_bytes() + size <= self.max_bytes
+
+    def _copy(self, video_id, source):
+        from_drive = isinstance(source, dict)
+        if from_drive:
+            size = int(source['size'])
+            dest = os.path.join(self.spool_dir, source['name'])
+        else:
+            size = os.path.getsize(source)
+            dest = os.path.join(self.spool_dir, os.path.basename(source))
+        with self._cond:
+            while not self._has_room(size):
+                if self._stop.is_set():
+                    return None
+                self._cond.wait(timeout=1)
+            self._spooled[video_id] = (dest, size)
+        tmp = f"{dest}.part"
+        try:
+            if from_drive:
+                from src.core.google_api import GoogleClient
+                GoogleClient().download_from_drive(source['id'], dest, size, source.get('md5Checksum'))
+            else:
+                shutil.copyfile(source, tmp)
+                os.replace(tmp, dest)
+        except Exception:
+            with self._cond:
+                self._spooled.pop(video_id, None)
+                self._cond.notify_all()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return dest
+
+    def _worker(self, tasks, ready):
+        try:
+            for video_id, source in tasks:
+                if self._stop.is_set():
+                    break
+                try:
+                    path = self._copy(video_id, source)
+                except Exception as e:
+                    if isinstance(source, dict):
+                        print(f"⚠️ Drive 下载失败 {video_id}，下一轮重试: {e}")
+                        continue
+                    print(f"⚠️ 预取失败 {video_id}，改为直接读取挂载: {e}")
+                    path = source
+                if path is None:
+                    break
+                ready.put((video_id, path))
+        finally:
+            # 结束标记：Drive 下载失败跳过的任务不会产出
+            ready.put(None)
+
+    def run(self, tasks):
+        """按原顺序产出 (video_id, 本地路径)；下一个文件已复制完成时不等待网络"""
+        tasks = list(tasks)
+        ready = queue.Queue()
+        self._stop.clear()
+        thread = threading.Thread(target=self._worker, args=(tasks, ready), name="audio-prefetch", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = ready.get()
+                if item is None:
+                    break
+                yield item
+        finally:
+            self._stop.set()
+            with self._cond:
+                self._cond.notify_all()
+            thread.join()
+
+    def release(self, video_id):
+        """转录结束后删除本地副本，腾出缓冲空间"""
+        with self._cond:
+            entry = self._spooled.pop(video_id, None)
+            self._cond.notify_all()
+        if entry and os.path.exists(entry[0]):
+            os.remove(entry[0])
+
+    def clear(self):
+        """停止后台复制并删除缓冲区中剩余的文件"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        for video_id in list(self._spooled):
+            self.release(video_id)
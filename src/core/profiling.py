@@ -0,0 +1,152 @@
+import contextlib
+import cProfile
+import glob
+import json
+import os
+import threading
+import time
+import tracemalloc
+from src.core.config import Config
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _current_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class _RssSampler:
+    """后台线程按固定间隔采样本进程 RSS，记录任务期间的峰值 (含 CTranslate2/numpy 等原生内存)"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak = _current_rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, _current_rss())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _current_rss())
+        return False
+
+
+class JobProfiler:
+    """按任务采集 cProfile 与内存数据 (PROFILE_JOBS 开启时)
+
+    每个任务写出 <video_id>[-stage].prof (pstats 格式，可用 snakeviz 查看) 与同名 .json 摘要
+    (耗时、RSS 峰值、tracemalloc 峰值与分配最多的代码行)，目录中只保留耗时最长的 PROFILE_KEEP 个任务。
+    cProfile 同一时刻只能有一个实例生效，并发任务中仅第一个采集 CPU 剖析，其余只记录耗时与内存；
+    tracemalloc 峰值为进程级，并发时会包含其他任务的分配。
+    关闭时 profile() 直接返回空上下文，不产生额外开销。
+    """
+
+    _cpu_lock = threading.Lock()
+    # tracemalloc 为进程级开关，并发任务按引用计数共用
+    _trace_lock = threading.Lock()
+    _trace_users = 0
+
+    def __init__(self, node, enabled=None, directory=None, keep=None):
+        self.enabled = Config.PROFILE_JOBS if enabled is None else enabled
+        self.directory = os.path.join(directory or Config.PROFILE_DIR, node)
+        self.keep = keep or Config.PROFILE_KEEP
+
+    def profile(self, video_id, stage=None):
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return self._profile(video_id, stage)
+
+    @contextlib.contextmanager
+    def _profile(self, video_id, stage):
+        name = f"{video_id}-{stage}" if stage else video_id
+        profiler = cProfile.Profile() if self._cpu_lock.acquire(blocking=False) else None
+        self._start_tracing()
+        start = time.monotonic()
+        try:
+            with _RssSampler() as rss:
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    yield
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            elapsed = time.monotonic() - start
+            _, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            self._stop_tracing()
+            if profiler is not None:
+                self._cpu_lock.release()
+            self._save(name, video_id, stage, elapsed, rss.peak, traced_peak, snapshot, profiler)
+
+    @classmethod
+    def _start_tracing(cls):
+        with cls._trace_lock:
+            if cls._trace_users == 0:
+                tracemalloc.start(10)
+            cls._trace_users += 1
+            tracemalloc.reset_peak()
+
+    @classmethod
+    def _stop_tracing(cls):
+        with cls._trace_lock:
+            cls._trace_users -= 1
+            if cls._trace_users == 0:
+                tracemalloc.stop()
+
+    def _save(self, name, video_id, stage, elapsed, rss_peak, traced_peak, snapshot, profiler):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, name)
+            if profiler is not None:
+                profiler.dump_stats(f"{base}.prof")
+            top = snapshot.statistics('lineno')[:Config.PROFILE_TOP]
+            summary = {
+                'video_id': video_id,
+                'stage': stage,
+                'pid': os.getpid(),
+                'elapsed': round(elapsed, 3),
+                'peak_rss_mb': round(rss_peak / 1048576, 1),
+                'tracemalloc_peak_mb': round(traced_peak / 1048576, 1),
+                'cpu_profile': profiler is not None,
+                'top_allocations': [
+                    {'where': str(stat.traceback[0]), 'size_kb': round(stat.size / 1024, 1), 'count': stat.count}
+                    for stat in top
+                ],
+            }
+            with open(f"{base}.json", 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+            print(f"🔬 性能剖析 {name}: {elapsed:.1f}s | RSS 峰值 {summary['peak_rss_mb']} MB")
+            self._prune()
+        except Exception as e:
+            print(f"⚠️ 性能剖析保存失败 {name}: {e}")
+
+    def _prune(self):
+        """只保留耗时最长的 keep 个任务；多进程同时清理时忽略已被删除的文件"""
+        entries = []
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    entries.append((json.load(f)['elapsed'], path))
+            except (OSError, ValueError, KeyError):
+                continue
+        entries.sort(reverse=True)
+        for _, path in entries[self.keep:]:
+            for artifact in (path, path[:-len('.json')] + '.prof'):
+                try:
+                    os.remove(artifact)
+                except OSError:
+                    pass
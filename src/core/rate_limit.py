@@ -0,0 +1,46 @@
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """带抖动的令牌桶：多个下载线程共享，保证对 YouTube 的平均请求间隔不变
+
+    每个令牌的补充间隔在 [min_interval, max_interval] 内随机抽取，
+    与原先逐条 random.uniform(MIN_DELAY, MAX_DELAY) 休眠的平均速率一致；
+    capacity 控制空闲后允许的突发请求数。
+    """
+
+    def __init__(self, min_interval, max_interval, capacity=1):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.capacity = max(1, capacity)
+        self._tokens = 0
+        self._next_refill = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _interval(self):
+        return random.uniform(self.min_interval, self.max_interval)
+
+    def _refill(self, now):
+        while self._next_refill is not None and self._next_refill <= now:
+            self._tokens += 1
+            if self._tokens >= self.capacity:
+                # 桶满时暂停计时，空闲时间不累积成额外令牌
+                self._next_refill = None
+            else:
+                self._next_refill += self._interval()
+
+    def acquire(self):
+        """阻塞直到取得一个令牌，返回等待秒数"""
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens > 0:
+                    self._tokens -= 1
+                    if self._next_refill is None:
+                        self._next_refill = now + self._interval()
+                    return now - start
+                self._cond.wait(self._next_refill - now)
@@ -0,0 +1,87 @@
+import time
+from src.core.config import Config
+from src.core.google_api import GoogleClient
+
+
+def sheet_revision_signal():
+    """Production 表的版本号 (Drive 元数据，一次轻量请求)"""
+    worksheet = GoogleClient().get_production_sheet()
+    spreadsheet_id = getattr(worksheet, 'spreadsheet_id', None) or worksheet.spreadsheet.id
+    return GoogleClient().get_sheet_revision(spreadsheet_id)
+
+
+class DriveFolderChanges:
+    """Drive changes 令牌：文件夹内有新增/修改的文件时计数加一"""
+
+    def __init__(self, folder_id):
+        self.folder_id = folder_id
+        self._token = None
+        self._count = 0
+
+    def __call__(self):
+        google = GoogleClient()
+        if self._token is None:
+            self._token = google.get_changes_start_token()
+            return self._count
+        changes, self._token = google.list_changes(self._token)
+        if any(self.folder_id in (c.get('file') or {}).get('parents', []) for c in changes):
+            self._count += 1
+        return self._count
+
+
+class AdaptiveScheduler:
+    """事件驱动的轮询调度：空闲时高频探测廉价的变更信号，发现变更立即开始下一轮
+
+    cycle() 返回本轮处理条数；有产出时等待时间重置为 min_idle，
+    连续空转则指数退避直至 max_idle。max_idle 到期时即使没有变更也会兜底跑一轮。
+    信号基线在每轮结束后重新读取，本节点自己回推表格产生的版本变化不会触发空转。
+    """
+
+    def __init__(self, cycle, signals, max_idle, min_idle=None, poll_interval=None):
+        self.cycle = cycle
+        self.signals = signals
+        self.max_idle = max_idle
+        self.min_idle = min(Config.IDLE_MIN_SECONDS if min_idle is None else min_idle, max_idle)
+        self.poll_interval = poll_interval or Config.CHANGE_POLL_INTERVAL
+        self._baseline = []
+
+    def _read_signals(self):
+        values = []
+        for signal in self.signals:
+            try:
+                values.append(signal())
+            except Exception as e:
+                print(f"⚠️ 变更信号读取失败: {e}")
+                values.append(None)
+        return values
+
+    def _changed(self):
+        current = self._read_signals()
+        changed = any(
+            new is not None and old is not None and new != old
+            for old, new in zip(self._baseline, current)
+        )
+        # 之前读取失败的信号在恢复后补上基线
+        self._baseline = [old if old is not None else new for old, new in zip(self._baseline, current)]
+        return changed
+
+    def wait(self, idle):
+        """最多等待 idle 秒；期间检测到变更立即返回 True"""
+        deadline = time.monotonic() + idle
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+            if self._changed():
+                return True
+
+    def run_forever(self):
+        idle = self.min_idle
+        while True:
+            processed = self.cycle()
+            self._baseline = self._read_signals()
+            idle = self.min_idle if processed else min(idle * 2, self.max_idle)
+            print(f"\n进入休眠，最长 {idle} 秒 (检测到变更时立即开始下一轮)...")
+            if self.wait(idle):
+                print("🔔 检测到任务变更，立即开始下一轮")
@@ -0,0 +1,93 @@
+import atexit
+import threading
+import time
+from gspread.utils import rowcol_to_a1
+from src.core import metrics
+from src.core.config import Config
+
+
+class SheetWriter:
+    """写回缓冲：合并同一行的单元格更新，按数量/时间阈值用一次 batch_update 刷写"""
+
+    def __init__(self, worksheet, max_pending=None, flush_interval=None):
+        self.worksheet = worksheet
+        self.max_pending = max_pending or Config.SHEET_FLUSH_SIZE
+        self.flush_interval = flush_interval or Config.SHEET_FLUSH_INTERVAL
+        self._pending = {}  # row -> {col: value}
+        self._first_pending_at = None
+        self._lock = threading.RLock()
+        # 进程退出时兜底刷写，避免状态丢失
+        atexit.register(self.flush)
+
+    def update_cell(self, row, col, value):
+        self.update_range(row, col, [value])
+
+    def update_range(self, row, col, values):
+        """从 (row, col) 开始向右写入一段连续单元格"""
+        with self._lock:
+            cells = self._pending.setdefault(row, {})
+            for offset, value in enumerate(values):
+                cells[col + offset] = value
+            if self._first_pending_at is None:
+                self._first_pending_at = time.monotonic()
+            if self._should_flush():
+                self.flush()
+
+    def _should_flush(self):
+        if len(self._pending) >= self.max_pending:
+            return True
+        return time.monotonic() - self._first_pending_at >= self.flush_interval
+
+    def _build_batch(self, pending):
+        """同一行内相邻的列合并为一个区间"""
+        data = []
+        for row in sorted(pending):
+            cols = sorted(pending[row])
+            start = prev = cols[0]
+            values = [pending[row][start]]
+            for col in cols[1:]:
+                if col == prev + 1:
+                    values.append(pending[row][col])
+                else:
+                    data.append({'range': rowcol_to_a1(row, start), 'values': [values]})
+                    start = col
+                    values = [pending[row][col]]
+                prev = col
+            data.append({'range': rowcol_to_a1(row, start), 'values': [values]})
+        return data
+
+    def flush(self):
+        """立即把缓冲区写入表格；失败时保留缓冲以便下次重试"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            pending = self._pending
+            self._pending = {}
+            self._first_pending_at = None
+            try:
+                metrics.API_CALLS.inc(api='sheets', method='batch_update')
+                self.worksheet.batch_update(
+                    self._build_batch(pending),
+                    value_input_option='USER_ENTERED'
+                )
+            except Exception:
+                # 回滚：较新的写入优先
+                for row, cells in pending.items():
+                    merged = dict(cells)
+                    merged.update(self._pending.get(row, {}))
+                    self._pending[row] = merged
+                self._first_pending_at = time.monotonic()
+                raise
+            return len(pending)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            atexit.unregister(self.flush)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,431 @@
+import difflib
+import gc
+import itertools
+import os
+import queue
+import threading
+import time
+import multiprocessing as mp
+from faster_whisper import BatchedInferencePipeline, WhisperModel
+from faster_whisper.audio import decode_audio
+from src.core.config import Config
+from src.core.checkpoint import SegmentCheckpoint
+from src.core.profiling import JobProfiler
+from src.core.transcript_cache import TranscriptCache, get_cache
+from src.core.vad import SAMPLE_RATE, chunk_regions, speech_ratio, speech_regions
+
+INITIAL_PROMPT = "以下是关于科技、生活或时政的中文对话，请使用简体中文输出。"
+
+# int8 量化下单个模型进程的大致常驻内存 (GB)，用于推算进程池大小
+MODEL_MEMORY_GB = {
+    'tiny': 0.3,
+    'base': 0.4,
+    'small': 0.8,
+    'medium': 1.8,
+    'large-v2': 3.5,
+    'large-v3': 3.5,
+}
+
+
+def load_model(cpu_threads=0):
+    return WhisperModel(
+        Config.WHISPER_MODEL_SIZE,
+        device=Config.DEVICE,
+        compute_type=Config.COMPUTE_TYPE,
+        cpu_threads=cpu_threads,
+        num_workers=Config.WHISPER_NUM_WORKERS
+    )
+
+
+def _decode_and_lookup(audio_path, use_cache=True):
+    """先按文件指纹、再解码后按内容查询字幕缓存，返回 (audio, 缓存键, 缓存结果或 None)
+
+    指纹命中时不解码，audio 与缓存键均为 None。调用方在预取之后执行，指纹读取的是本地副本。
+    """
+    cache = get_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get_by_file(audio_path, INITIAL_PROMPT)
+        if cached is not None:
+            return None, None, cached
+    audio = decode_audio(audio_path, sampling_rate=SAMPLE_RATE)
+    if cache is None:
+        return audio, None, None
+    key = TranscriptCache.audio_key(audio, INITIAL_PROMPT)
+    return audio, key, cache.get(key)
+
+
+def cached_result(audio_path):
+    """只按文件指纹查缓存 (不解码、不加载模型)；命中时返回与 transcribe_file 相同格式的结果，否则返回 None"""
+    cache = get_cache()
+    if cache is None:
+        return None
+    start = time.monotonic()
+    cached = cache.get_by_file(audio_path, INITIAL_PROMPT)
+    if cached is None:
+        return None
+    return dict(cached, cached=True, elapsed=time.monotonic() - start)
+
+
+def transcribe_file(model, audio_path, batched=None, use_cache=True, get_model=None):
+    """转录单个文件，返回 {'text', 'duration', 'speech_ratio', 'cached', 'elapsed'}
+
+    解码后先按音频内容查询字幕缓存，命中则不调用模型。
+    传入 get_model (无参函数) 代替 model 时，只在缓存未命中且确有语音时才调用它加载模型。
+    VAD_PREPASS 开启时先计算一次语音区间 (可缓存)，仅把语音部分交给模型解码；
+    batched 模式下语音区间按 30 秒窗口分块，在一次前向中并行解码多个块。
+    每个片段产出后立即写入检查点，重启后从最后一个片段的结束时间续转；片段文本只落盘不在内存中累积，
+    全文在结束时从检查点拼接。注意解码后的整段 PCM 仍常驻内存 (16kHz float32 约 230MB/小时)，
+    多小时音频的内存占用随时长线性增长，并非恒定。
+    """
+    start = time.monotonic()
+    audio, key, cached = _decode_and_lookup(audio_path, use_cache)
+    if cached is not None:
+        return dict(cached, cached=True, elapsed=time.monotonic() - start)
+    duration = len(audio) / SAMPLE_RATE
+
+    regions = None
+    ratio = None
+    if Config.VAD_PREPASS:
+        regions = speech_regions(audio, audio_path)
+        ratio = speech_ratio(regions, duration)
+        if not regions:
+            return {'text': "", 'duration': duration, 'speech_ratio': ratio, 'cached': False,
+                    'elapsed': time.monotonic() - start}
+
+    # 检查点续转：只解码上次崩溃前最后一个已落盘片段之后的部分
+    checkpoint = SegmentCheckpoint(audio_path, INITIAL_PROMPT)
+    done, offset = checkpoint.load()
+    if offset > 0:
+        print(f"♻️ 从检查点续转 {os.path.basename(audio_path)}: 已完成 {done} 段，自 {offset:.0f}s 继续")
+    if regions is None:
+        regions = [[0.0, duration]]
+    remaining = [[max(start, offset), end] for start, end in regions if end > offset]
+
+    if batched is None:
+        batched = Config.WHISPER_BATCHED
+    if remaining and model is None:
+        model = get_model()
+    segments = []
+    if remaining and batched:
+        segments, info = BatchedInferencePipeline(model=model).transcribe(
+            audio,
+            batch_size=Config.WHISPER_BATCH_SIZE,
+            beam_size=Config.WHISPER_BEAM_SIZE,
+            initial_prompt=INITIAL_PROMPT,
+            # faster-whisper 1.2 起批量模式的 clip_timestamps 以秒为单位 (1.1 为采样点数)
+            clip_timestamps=[
+                {'start': start, 'end': end}
+                for start, end in chunk_regions(remaining)
+            ]
+        )
+    elif remaining:
+        segments, info = model.transcribe(
+            audio,
+            beam_size=Config.WHISPER_BEAM_SIZE,
+            initial_prompt=INITIAL_PROMPT,
+            clip_timestamps=[t for region in remaining for t in region]
+        )
+
+    # 片段边产出边落盘，崩溃时最多损失一个窗口
+    checkpoint.open(resume=offset > 0)
+    try:
+        for segment in segments:
+            checkpoint.append(segment)
+    finally:
+        checkpoint.close()
+
+    result = {
+        'text': checkpoint.text(),
+        'duration': duration,
+        'speech_ratio': ratio,
+    }
+    if key is not None:
+        get_cache().put(key, result, audio_path, INITIAL_PROMPT)
+    checkpoint.discard()
+    return dict(result, cached=False, elapsed=time.monotonic() - start)
+
+
+def compare_modes(model, audio_paths):
+    """在参考音频上对比顺序与批量模式的输出，返回 [(路径, 文本相似度, 顺序耗时, 批量耗时)]"""
+    report = []
+    for audio_path in audio_paths:
+        start = time.monotonic()
+        sequential = transcribe_file(model, audio_path, batched=False, use_cache=False)['text']
+        middle = time.monotonic()
+        batched = transcribe_file(model, audio_path, batched=True, use_cache=False)['text']
+        end = time.monotonic()
+        ratio = difflib.SequenceMatcher(None, sequential, batched).ratio()
+        report.append((audio_path, ratio, middle - start, end - middle))
+    return report
+
+
+class ResidentModel:
+    """进程内常驻的 Whisper 模型：有任务时才加载，跨轮次复用，空闲超时后释放内存"""
+
+    def __init__(self, idle_timeout=None):
+        self.idle_timeout = Config.WHISPER_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._model = None
+        self._loaded_at = None
+        self._last_used = None
+        self._lock = threading.Lock()
+        self._profiler = JobProfiler("hk")
+        self.load_count = 0
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        with self._lock:
+            if self._model is None:
+                print(f"正在加载 Whisper 模型 ({Config.WHISPER_MODEL_SIZE})...")
+                start = time.monotonic()
+                self._model = load_model(Config.WHISPER_CPU_THREADS)
+                self._loaded_at = time.monotonic()
+                self.load_count += 1
+                print(f"✅ 模型加载完成，耗时 {self._loaded_at - start:.1f} 秒 (第 {self.load_count} 次加载)")
+            self._last_used = time.monotonic()
+            return self._model
+
+    def run(self, tasks):
+        """依次转录 [(video_id, audio_path), ...]，逐条产出 (video_id, result, error)"""
+        for video_id, audio_path in tasks:
+            try:
+                with self._profiler.profile(video_id):
+                    # 缓存命中或无语音时不加载模型
+                    result = transcribe_file(None, audio_path, get_model=self.get)
+            except Exception as e:
+                yield video_id, None, e
+                continue
+            finally:
+                # 空闲计时从任务结束算起，长音频转录完不会被立即释放
+                if self._model is not None:
+                    self._last_used = time.monotonic()
+            yield video_id, result, None
+
+    def release_if_idle(self):
+        """距上次使用超过 idle_timeout 时释放模型；返回是否已释放"""
+        with self._lock:
+            if self._model is None or time.monotonic() - self._last_used < self.idle_timeout:
+                return False
+        self.unload()
+        return True
+
+    def unload(self):
+        with self._lock:
+            if self._model is None:
+                return
+            resident = time.monotonic() - self._loaded_at
+            self._model = None
+            gc.collect()
+            print(f"🧹 Whisper 模型已释放，常驻 {resident / 60:.1f} 分钟")
+
+
+def _available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _available_memory_gb():
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) / 1024 / 1024
+    except OSError:
+        pass
+    return None
+
+
+def plan_pool(cpus=None):
+    """根据核数与模型大小推算进程数，并把 CPU 均分给各进程
+
+    返回 [[cpu, ...], ...]，每个子列表对应一个工作进程的亲和性集合。
+    """
+    cpus = cpus or _available_cpus()
+    threads = Config.WHISPER_CPU_THREADS or 4
+    size = Config.TRANSCRIBE_PROCESSES
+    if size <= 0:
+        size = max(1, len(cpus) // threads)
+        memory = _available_memory_gb()
+        per_model = MODEL_MEMORY_GB.get(Config.WHISPER_MODEL_SIZE, 2.0)
+        if memory is not None:
+            # 预留 1GB 给系统与解码缓冲
+            size = max(1, min(size, int((memory - 1) // per_model)))
+    size = min(size, len(cpus))
+    per_worker = len(cpus) // size
+    return [cpus[i * per_worker:(i + 1) * per_worker] for i in range(size)]
+
+
+def _pool_worker(cpus, task_queue, result_queue):
+    """工作进程：绑定 CPU，持有独立模型，从共享队列领取任务"""
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"⚠️ 无法绑定 CPU {cpus}: {e}")
+    start = time.monotonic()
+    model = load_model(cpu_threads=len(cpus))
+    profiler = JobProfiler("hk")
+    print(f"✅ 转录进程 {os.getpid()} 就绪 (CPU {cpus[0]}-{cpus[-1]}, 加载 {time.monotonic() - start:.1f} 秒)")
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        video_id, audio_path = task
+        result_queue.put(('start', os.getpid(), video_id, None))
+        try:
+            with profiler.profile(video_id):
+                result = transcribe_file(model, audio_path)
+            result_queue.put(('done', os.getpid(), video_id, result))
+        except Exception as e:
+            result_queue.put(('error', os.getpid(), video_id, str(e)))
+
+
+class TranscriptionPool:
+    """多进程转录池：每个进程持有一个模型并绑定一组 CPU，共享任务队列
+
+    与 ResidentModel 接口一致：有任务时才启动进程，空闲超时后整体关闭。
+    进程意外退出 (如 OOM) 时，其手中的任务记为失败并在同一组 CPU 上重启进程。
+    """
+
+    def __init__(self, plan=None, idle_timeout=None):
+        self.plan = plan or plan_pool()
+        self.idle_timeout = Config.WHISPER_IDLE_TIMEOUT if idle_timeout is None else idle_timeout
+        self._ctx = mp.get_context('spawn')
+        self._procs = {}  # pid -> (process, cpus)
+        self._tasks = None
+        self._results = None
+        self._last_used = None
+
+    @property
+    def loaded(self):
+        return bool(self._procs)
+
+    def _spawn(self, cpus):
+        proc = self._ctx.Process(
+            target=_pool_worker, args=(cpus, self._tasks, self._results), daemon=True
+        )
+        proc.start()
+        self._procs[proc.pid] = (proc, cpus)
+
+    def start(self):
+        if self._procs:
+            return
+        print(f"正在启动转录进程池: {len(self.plan)} 进程 × {len(self.plan[0])} 线程 ({Config.WHISPER_MODEL_SIZE})")
+        self._tasks = self._ctx.Queue()
+        self._results = self._ctx.Queue()
+        for cpus in self.plan:
+            self._spawn(cpus)
+
+    def run(self, tasks):
+        """边接收边提交任务 (tasks 可以是预取生成器)，按完成顺序产出 (video_id, result, error)
+
+        进程池未启动时先在主进程按文件指纹逐条查字幕缓存 (只读首尾各 1MB，不解码)，
+        直到第一条未命中才启动进程池，整轮都是重复文件时不加载任何模型；
+        按解码内容的缓存查询留在工作进程内，与转录共用同一次解码。
+        """
+        tasks = iter(tasks)
+        first = None
+        for task in tasks:
+            if self._procs or get_cache() is None:
+                first = task
+                break
+            try:
+                cached = cached_result(task[1])
+            except Exception as e:
+                yield task[0], None, e
+                continue
+            if cached is None:
+                first = task
+                break
+            yield task[0], cached, None
+        if first is None:
+            return
+        self.start()
+        submitted = [0]
+        fed = threading.Event()
+
+        def feed():
+            try:
+                for task in itertools.chain([first], tasks):
+                    self._tasks.put(task)
+                    submitted[0] += 1
+            finally:
+                fed.set()
+
+        threading.Thread(target=feed, name="pool-feeder", daemon=True).start()
+        finished = 0
+        in_flight = {}  # pid -> video_id
+        crashes = 0
+        while not fed.is_set() or finished < submitted[0]:
+            try:
+                kind, pid, video_id, payload = self._results.get(timeout=5)
+            except queue.Empty:
+                lost, died = self._reap(in_flight)
+                crashes += died
+                if crashes > 2 * len(self.plan):
+                    # 进程反复崩溃 (多为内存不足或模型无法加载)，停止重启以免空转
+                    self.unload()
+                    raise RuntimeError(f"转录进程连续崩溃 {crashes} 次，已停止进程池")
+                for lost_id in lost:
+                    finished += 1
+                    yield lost_id, None, RuntimeError("转录工作进程崩溃")
+                continue
+            if kind == 'start':
+                in_flight[pid] = video_id
+                continue
+            in_flight.pop(pid, None)
+            finished += 1
+            if kind == 'done':
+                yield video_id, payload, None
+            else:
+                yield video_id, None, RuntimeError(payload)
+        self._last_used = time.monotonic()
+
+    def _reap(self, in_flight):
+        """处理意外退出的进程：返回 (丢失的 video_id 列表, 退出进程数)"""
+        lost = []
+        died = 0
+        for pid, (proc, cpus) in list(self._procs.items()):
+            if proc.is_alive():
+                continue
+            del self._procs[pid]
+            died += 1
+            video_id = in_flight.pop(pid, None)
+            print(f"⚠️ 转录进程 {pid} 异常退出 (code {proc.exitcode})，正在重启")
+            if video_id is not None:
+                lost.append(video_id)
+            self._spawn(cpus)
+        return lost, died
+
+    def release_if_idle(self):
+        if not self._procs or self._last_used is None:
+            return False
+        if time.monotonic() - self._last_used < self.idle_timeout:
+            return False
+        self.unload()
+        return True
+
+    def unload(self):
+        if not self._procs:
+            return
+        for _ in self._procs:
+            self._tasks.put(None)
+        for proc, _ in self._procs.values():
+            proc.join(timeout=30)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = {}
+        print("🧹 转录进程池已关闭")
+
+
+def create_engine():
+    """单进程 (或 GPU) 时使用 ResidentModel，否则按 CPU 规划启用多进程池"""
+    if Config.DEVICE != 'cpu':
+        return ResidentModel()
+    plan = plan_pool()
+    if len(plan) == 1:
+        return ResidentModel()
+    return TranscriptionPool(plan)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+from src.core.config import Config
+
+# 文件指纹只读取首尾各 1MB + 文件大小，避免在 rclone 挂载上整文件读取
+FINGERPRINT_BYTES = 1024 * 1024
+
+
+class TranscriptCache:
+    """按解码后音频内容寻址的字幕缓存 (磁盘 LRU)
+
+    主键: sha256(PCM 采样 + 模型大小 + 计算精度 + 提示词)，重新上传/镜像/状态重置的同一音频可直接命中。
+    别名: sha256(文件指纹 + 模型大小 + 计算精度 + 提示词) -> 主键，完全相同的文件无需解码即可在毫秒级命中；
+    与主键一样包含转录配置，切换模型或提示词后不会命中旧配置的结果。
+    命中时刷新 mtime，写入时按 mtime 淘汰最旧条目直至总大小低于上限。
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or Config.TRANSCRIPT_CACHE_DIR
+        self.max_bytes = max_bytes or Config.TRANSCRIPT_CACHE_MAX_MB * 1024 * 1024
+        self._entries = os.path.join(self.root, 'entries')
+        self._aliases = os.path.join(self.root, 'aliases')
+        os.makedirs(self._entries, exist_ok=True)
+        os.makedirs(self._aliases, exist_ok=True)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def file_fingerprint(path):
+        size = os.path.getsize(path)
+        digest = hashlib.sha256(str(size).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read(FINGERPRINT_BYTES))
+            if size > 2 * FINGERPRINT_BYTES:
+                f.seek(-FINGERPRINT_BYTES, os.SEEK_END)
+                digest.update(f.read(FINGERPRINT_BYTES))
+        return digest.hexdigest()
+
+    @staticmethod
+    def _config_tag(prompt):
+        return f"|{Config.WHISPER_MODEL_SIZE}|{Config.COMPUTE_TYPE}|{prompt}".encode()
+
+    @classmethod
+    def audio_key(cls, audio, prompt):
+        digest = hashlib.sha256(audio.tobytes())
+        digest.update(cls._config_tag(prompt))
+        return digest.hexdigest()
+
+    @classmethod
+    def alias_key(cls, path, prompt):
+        digest = hashlib.sha256(cls.file_fingerprint(path).encode())
+        digest.update(cls._config_tag(prompt))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self._entries, f"{key}.json")
+
+    def get(self, key):
+        path = self._entry_path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def get_by_file(self, audio_path, prompt):
+        """通过文件指纹查找，不解码音频；未命中不计入统计 (随后会按音频内容再查一次)"""
+        try:
+            with open(os.path.join(self._aliases, self.alias_key(audio_path, prompt))) as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+        path = self._entry_path(key)
+        if not os.path.exists(path):
+            return None
+        return self.get(key)
+
+    def put(self, key, result, audio_path=None, prompt=""):
+        self._write(self._entry_path(key), json.dumps(result, ensure_ascii=False))
+        if audio_path:
+            self._write(os.path.join(self._aliases, self.alias_key(audio_path, prompt)), key)
+        self._evict()
+
+    @staticmethod
+    def _write(path, data):
+        # 先写临时文件再原子替换，多个转录进程并发写入时不会读到半截内容
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self._entries) as it:
+            for entry in it:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+_cache = None
+
+
+def get_cache():
+    """进程内共享的缓存实例；未启用时返回 None"""
+    global _cache
+    if not Config.TRANSCRIPT_CACHE:
+        return None
+    if _cache is None:
+        _cache = TranscriptCache()
+    return _cache
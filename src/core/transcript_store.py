@@ -0,0 +1,136 @@
+import gzip
+import os
+import re
+from src.core.config import Config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 表格 E 列中指向完整字幕的指针，形如 transcript://<video_id>.txt.gz
+POINTER_PREFIX = "transcript://"
+POINTER_PATTERN = re.compile(r"transcript://(\S+)\s*$")
+
+# Sheets 单元格上限为 50000 字符，关闭外置存储时超长字幕截断到该长度以内
+CELL_LIMIT = 50000
+
+CODECS = {
+    'gzip': '.txt.gz',
+    'zstd': '.txt.zst',
+}
+
+
+def _compress(text, codec):
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data)
+
+
+def _decompress(data, filename):
+    if filename.endswith(CODECS['zstd']):
+        if zstandard is None:
+            raise RuntimeError("读取 .zst 字幕需要安装 zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data).decode('utf-8')
+    return gzip.decompress(data).decode('utf-8')
+
+
+def parse_pointer(cell):
+    """返回单元格中的字幕文件名；普通内联字幕返回 None"""
+    match = POINTER_PATTERN.search(cell or "")
+    return match.group(1) if match else None
+
+
+class TranscriptStore:
+    """表格外的字幕存储：完整字幕压缩后按 video_id 存入本地目录或 Drive 文件夹
+
+    E 列只保留开头预览 + 指针，表格扫描不再拉取整篇字幕，也不受单元格 5 万字符上限限制。
+    backend 为 local 时 LA/HK 需共享同一目录 (如 rclone 挂载)。
+    """
+
+    def __init__(self, backend=None, codec=None):
+        self.backend = backend or Config.TRANSCRIPT_STORE
+        self.codec = codec or Config.TRANSCRIPT_STORE_CODEC
+        if self.backend not in ('local', 'drive'):
+            raise ValueError(f"未知的字幕存储后端: {self.backend}")
+        if self.codec not in CODECS:
+            raise ValueError(f"未知的字幕压缩格式: {self.codec}")
+        if self.codec == 'zstd' and zstandard is None:
+            print("⚠️ 未安装 zstandard，字幕存储改用 gzip")
+            self.codec = 'gzip'
+
+    def _filename(self, video_id):
+        return f"{video_id}{CODECS[self.codec]}"
+
+    def _write(self, filename, data):
+        if self.backend == 'drive':
+            from src.core.google_api import GoogleClient
+            GoogleClient().put_bytes_to_drive(data, filename, Config.TRANSCRIPT_STORE_FOLDER_ID)
+            return
+        os.makedirs(Config.TRANSCRIPT_STORE_DIR, exist_ok=True)
+        path = os.path.join(Config.TRANSCRIPT_STORE_DIR, filename)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _read(self, filename):
+        if self.backend == 'drive':
+            from src.core.google_api import GoogleClient
+            google = GoogleClient()
+            file_id = google.find_drive_file(filename, Config.TRANSCRIPT_STORE_FOLDER_ID)
+            if not file_id:
+                raise FileNotFoundError(filename)
+            return google.get_bytes_from_drive(file_id)
+        with open(os.path.join(Config.TRANSCRIPT_STORE_DIR, filename), 'rb') as f:
+            return f.read()
+
+    def save(self, video_id, text):
+        """写入完整字幕，返回应填入 E 列的 预览 + 指针 (同一 video_id 重复写入会覆盖)"""
+        filename = self._filename(video_id)
+        self._write(filename, _compress(text, self.codec))
+        preview = text[:Config.TRANSCRIPT_PREVIEW_CHARS].strip()
+        if len(text) > Config.TRANSCRIPT_PREVIEW_CHARS:
+            preview += "…"
+        return f"{preview}\n{POINTER_PREFIX}{filename}"
+
+    def load(self, video_id):
+        """按 video_id 读取完整字幕"""
+        return self.load_file(self._filename(video_id))
+
+    def load_file(self, filename):
+        return _decompress(self._read(filename), filename)
+
+
+_store = None
+
+
+def get_transcript_store():
+    """进程内共享的字幕存储；未启用时返回 None"""
+    global _store
+    if not Config.TRANSCRIPT_STORE:
+        return None
+    if _store is None:
+        _store = TranscriptStore()
+    return _store
+
+
+def cell_value(video_id, text):
+    """回推表格时 E 列的实际内容"""
+    store = get_transcript_store()
+    if store is not None:
+        return store.save(video_id, text)
+    if len(text) > CELL_LIMIT:
+        print(f"⚠️ 字幕超过单元格上限 ({len(text)} 字符)，已截断: {video_id}；可启用 TRANSCRIPT_STORE")
+        return text[:CELL_LIMIT - 1] + "…"
+    return text
+
+
+def read_transcript(cell):
+    """读取 E 列对应的完整字幕 (供下游 Gemini 创作节点等使用)"""
+    filename = parse_pointer(cell)
+    if filename is None:
+        return cell
+    store = get_transcript_store() or TranscriptStore(backend='local')
+    return store.load_file(filename)
@@ -0,0 +1,55 @@
+import json
+import os
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+from src.core.config import Config
+
+SAMPLE_RATE = 16000
+
+
+def _cache_path(audio_path):
+    # 以文件名 + 大小为键：同一音频被重新转录 (如“转录失败”后重置) 时直接复用
+    key = f"{os.path.basename(audio_path)}-{os.path.getsize(audio_path)}"
+    return os.path.join(Config.VAD_CACHE_DIR, f"{key}.json")
+
+
+def speech_regions(audio, audio_path=None):
+    """对已解码的 16kHz 音频做一次 VAD，返回语音区间 [[start_s, end_s], ...]
+
+    传入 audio_path 时结果缓存到 VAD_CACHE_DIR。
+    """
+    cache_path = _cache_path(audio_path) if audio_path else None
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path) as f:
+            return json.load(f)
+
+    options = VadOptions(min_silence_duration_ms=Config.VAD_MIN_SILENCE_MS)
+    regions = [
+        [ts['start'] / SAMPLE_RATE, ts['end'] / SAMPLE_RATE]
+        for ts in get_speech_timestamps(audio, options)
+    ]
+
+    if cache_path:
+        os.makedirs(Config.VAD_CACHE_DIR, exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(regions, f)
+    return regions
+
+
+def speech_ratio(regions, duration):
+    if not duration:
+        return 0.0
+    return sum(end - start for start, end in regions) / duration
+
+
+def chunk_regions(regions, max_seconds=30.0):
+    """把语音区间合并/切分为不超过 max_seconds 的块 (批量推理的单个输入窗口)"""
+    chunks = []
+    for start, end in regions:
+        while end - start > max_seconds:
+            chunks.append([start, start + max_seconds])
+            start += max_seconds
+        if chunks and end - chunks[-1][0] <= max_seconds:
+            chunks[-1][1] = end
+        else:
+            chunks.append([start, end])
+    return chunks
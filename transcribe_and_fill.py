@@ -1,85 +1,192 @@
-import os
-import time
-from faster_whisper import WhisperModel
+import sys
+import signal
 from src.core.config import Config
 from src.core.google_api import GoogleClient
+from src.core import metrics
+from src.core.audio import create_inventory, estimate_duration
+from src.core.job_store import JobStore, SheetSync
+from src.core.planner import order_jobs, take_budget
+from src.core.prefetch import AudioPrefetcher
+from src.core.scheduler import AdaptiveScheduler, DriveFolderChanges, sheet_revision_signal
+from src.core.transcriber import TranscriptionPool, create_engine
+from src.core.transcript_cache import get_cache
+
+# 模型 (或多进程池) 跨轮次常驻，仅在扫描到就绪音频时加载，空闲超时后释放
+_engine = create_engine()
+
+# 音频来源：Drive 直连 / rclone 挂载 / 本地目录；清单跨轮次保留，用于识别大小仍在变化的文件
+_inventory = create_inventory()
+
+# 读取挂载盘时预取后续音频到本地，转录不再等待网络；Drive 直连时必须先下载到本地
+# 进程池同时转录多个文件，缓冲区按“在途任务 + 预取深度”计，否则多余的进程等不到音频
+_in_flight = len(_engine.plan) if isinstance(_engine, TranscriptionPool) else 0
+if Config.DRIVE_AUDIO_SOURCE:
+    _prefetcher = AudioPrefetcher(depth=_in_flight + max(Config.PREFETCH_DEPTH, 1))
+elif Config.RCLONE_MOUNT_PATH and Config.PREFETCH_DEPTH > 0:
+    _prefetcher = AudioPrefetcher(depth=_in_flight + Config.PREFETCH_DEPTH)
+else:
+    _prefetcher = None
 
 def transcribe_and_fill():
     """HK 节点逻辑：翻译官"""
     print("🚀 HK 转录节点启动 (已模块化)，正在扫描就绪音频...")
     
-    google = GoogleClient()
-    production_sheet = google.get_production_sheet()
+    store = JobStore()
+    sync = SheetSync(store, ["音频已就绪"])
     
-    # 延迟加载模型以优化内存
-    print(f"正在加载 Whisper 模型 ({Config.WHISPER_MODEL_SIZE})...")
-    model = WhisperModel(
-        Config.WHISPER_MODEL_SIZE, 
-        device=Config.DEVICE, 
-        compute_type=Config.COMPUTE_TYPE
-    )
-
-    records = production_sheet.get_all_values()
-    processed_count = 0
+    # 从表格拉取新任务到本地库；表格不可用时直接使用本地队列
+    sync.pull()
+    sync.start()
+    jobs = store.next_jobs("音频已就绪")
     
-    for i, row in enumerate(records[1:], start=2):
-        if processed_count >= Config.TRANSCRIPTION_LIMIT:
+    try:
+        processed_count = _process_jobs(store, sync, jobs)
+    finally:
+        # 本轮结束统一回推
+        sync.stop()
+        store.close()
+
+    if processed_count == 0:
+        print("暂无就绪音频。")
+        _engine.release_if_idle()
+    else:
+        print(f"\n任务处理完毕。共转录 {processed_count} 条。")
+    return processed_count
+
+def _process_jobs(store, sync, jobs):
+    if not jobs:
+        return 0
+    # 每轮只列一次目录，之后的查找不再逐条 stat 挂载盘
+    drive_folder = Config.DRIVE_FOLDER_ID if Config.AUDIO_INVENTORY_DRIVE and not Config.DRIVE_AUDIO_SOURCE else None
+    print(f"📂 音频清单: {_inventory.refresh(drive_folder)} 个文件")
+    cache = get_cache()
+    # 多节点共享表格时多取一倍候选，认领撞车后仍有空闲行可补
+    wanted = Config.TRANSCRIPTION_LIMIT * (2 if sync.lease else 1)
+    # 按时长排序时先在窗口内收集就绪音频，再挑选本轮任务
+    window = wanted if Config.SCHEDULE_ORDER == 'sheet' else max(wanted, Config.SCHEDULE_WINDOW)
+    ready = {}
+    for job in jobs:
+        if len(ready) >= window:
             break
             
-        video_id = row[1]
-        status = row[2] if len(row) > 2 else ""
-        transcript_cell = row[4] if len(row) > 4 else ""
+        video_id = job["video_id"]
         
-        # 仅处理状态为【音频已就绪】且 E 列为空的行
-        if status == "音频已就绪" and not transcript_cell:
-            print(f"\n--- 正在转录: {video_id} ---")
+        # 仅处理状态为【音频已就绪】且 E 列为空的行 (E 列已由扫描器过滤)
+        if job["status"] != "音频已就绪":
+            continue
             
-            # 音频路径：根据配置决定
-            audio_dir = Config.RCLONE_MOUNT_PATH if Config.RCLONE_MOUNT_PATH else Config.LOCAL_TEMP_DIR
-            audio_path = os.path.join(audio_dir, f"{video_id}.mp3")
-            
-            if not os.path.exists(audio_path):
-                print(f"⚠️ 音频文件未找到: {audio_path}，可能同步延迟，跳过。")
+        audio_path, reason = _inventory.find(video_id)
+        if not audio_path:
+            print(f"⚠️ {reason}: {_inventory.directory}/{video_id}.*，可能同步延迟，跳过。")
+            continue
+        ready[video_id] = (dict(job, duration=_audio_seconds(video_id)), audio_path)
+
+    candidates = order_jobs([job for job, _ in ready.values()])
+    claimed = sync.claim(candidates[:wanted], Config.TRANSCRIPTION_LIMIT)
+    # 按音频分钟预算截取本轮转录，超长视频不再拖住整轮
+    selected, rest = take_budget(claimed, Config.HK_BUDGET_MINUTES)
+    sync.release([job["video_id"] for job in rest])
+
+    rows = {}
+    tasks = []
+    for job in selected:
+        video_id = job["video_id"]
+        audio_path = ready[video_id][1]
+        rows[video_id] = job["sheet_row"]
+        store.start_attempt(video_id)
+        # 字幕缓存 (文件指纹/音频内容) 由转录引擎在预取之后查询，命中时不加载模型
+        print(f"\n--- 正在转录: {video_id} ---")
+        tasks.append((video_id, audio_path))
+
+    processed_count = 0
+    hits = 0
+    if _prefetcher and tasks:
+        tasks = _prefetcher.run(tasks)
+    tasks = _still_held(sync, tasks)
+    try:
+        # 推理转录 (模型/进程池按需启动并常驻)
+        for done, (video_id, result, error) in enumerate(_engine.run(tasks), 1):
+            if _prefetcher:
+                _prefetcher.release(video_id)
+            if not sync.held(video_id):
+                # 转录期间租约被其他节点接手，结果交由对方回填
+                print(f"🔒 {video_id} 租约已丢失，丢弃本次结果")
                 continue
+            processed_count += _record_result(store, rows, video_id, result, error)
+            metrics.QUEUE_DEPTH.set(len(rows) - done, stage="transcribe")
+            hits += bool(error is None and result['cached'])
+    finally:
+        if _prefetcher:
+            _prefetcher.clear()
 
-            try:
-                # 推理转录
-                segments, info = model.transcribe(
-                    audio_path, 
-                    beam_size=5, 
-                    initial_prompt="以下是关于科技、生活或时政的中文对话，请使用简体中文输出。"
-                )
-                
-                full_text = []
-                for segment in segments:
-                    full_text.append(segment.text)
-                
-                final_text = " ".join(full_text)
-                
-                # 回填表格
-                production_sheet.update_cell(i, 5, final_text)
-                production_sheet.update_cell(i, 3, "等待处理") 
-                print(f"✅ 转录完成并已更新表格 (行 {i})")
-                
-                processed_count += 1
-                
-            except Exception as e:
-                print(f"❌ 转录失败 {video_id}: {str(e)}")
-                production_sheet.update_cell(i, 3, "转录失败")
+    if rows and cache:
+        print(f"📦 字幕缓存: 命中 {hits} / 未命中 {len(rows) - hits}")
 
-    if processed_count == 0:
-        print("暂无就绪音频。")
-    else:
-        print(f"\n任务处理完毕。共转录 {processed_count} 条。")
+    return processed_count
+
+def _still_held(sync, tasks):
+    """提交转录前跳过租约已丢失的任务，已预取的本地副本随即删除"""
+    for video_id, audio_path in tasks:
+        if sync.held(video_id):
+            yield video_id, audio_path
+            continue
+        print(f"🔒 {video_id} 租约已丢失，跳过转录")
+        if _prefetcher:
+            _prefetcher.release(video_id)
+
+def _audio_seconds(video_id):
+    """HK 节点没有视频元数据，按清单中的文件大小估算时长"""
+    entry = _inventory.lookup(video_id)
+    if isinstance(entry, dict):
+        return estimate_duration(entry['name'], entry.get('size'))
+    return estimate_duration(entry.path, entry.size)
+
+def _record_result(store, rows, video_id, result, error):
+    """把单条转录结果写入本地库；返回是否成功回填"""
+    if error is not None:
+        metrics.JOBS.inc(node="hk", outcome="failed")
+        print(f"❌ 转录失败 {video_id}: {str(error)}")
+        store.update(video_id, status="转录失败")
+        return 0
+    if not result['cached']:
+        metrics.STAGE_SECONDS.observe(result['elapsed'], stage="transcribe")
+        metrics.WHISPER_AUDIO_SECONDS.inc(result['duration'])
+        metrics.WHISPER_BUSY_SECONDS.inc(result['elapsed'])
+        metrics.WHISPER_SPEED.set(round(result['duration'] / max(result['elapsed'], 1e-6), 2))
+    if not result['text'].strip():
+        metrics.JOBS.inc(node="hk", outcome="no_speech")
+        # E 列留空会让该行重新进入 LA 下载队列，直接标记失败交由人工确认
+        print(f"❌ 转录失败 {video_id}: 未检测到语音")
+        store.update(video_id, status="转录失败", speech_ratio=result['speech_ratio'])
+        return 0
+
+    # 回填本地库，由同步线程批量回推表格
+    store.update(video_id, status="等待处理", transcript=result['text'], speech_ratio=result['speech_ratio'])
+    metrics.JOBS.inc(node="hk", outcome="cached" if result['cached'] else "transcribed")
+    ratio = f", 语音占比 {result['speech_ratio']:.0%}" if result['speech_ratio'] is not None else ""
+    hit = " [缓存]" if result['cached'] else ""
+    print(f"✅ 转录完成并已更新表格 {video_id} (行 {rows[video_id]}{ratio}){hit}")
+    return 1
 
 if __name__ == "__main__":
-    while True:
+    # pkill 发送 SIGTERM 时走正常退出流程，保证本地状态被回推
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    def cycle():
         try:
-            transcribe_and_fill()
-            print("\n进入休眠，等待下一轮 (5分钟)...")
-            time.sleep(300)
-        except KeyboardInterrupt:
-            break
+            return transcribe_and_fill()
         except Exception as e:
             print(f"故障恢复中: {e}")
-            time.sleep(300)
+            # 丢弃缓存的表格句柄，下一轮重新打开
+            GoogleClient.reset_cache()
+            return 0
+
+    # 表格状态变为“音频已就绪”或音频文件夹有新文件时立即开始转录
+    signals = [sheet_revision_signal]
+    if Config.DRIVE_FOLDER_ID:
+        signals.append(DriveFolderChanges(Config.DRIVE_FOLDER_ID))
+    metrics.start_server(Config.HK_METRICS_PORT)
+    try:
+        AdaptiveScheduler(cycle, signals, Config.HK_IDLE_MAX).run_forever()
+    except KeyboardInterrupt:
+        pass